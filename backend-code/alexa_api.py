@@ -0,0 +1,121 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+logger = logging.getLogger()
+
+#off by default: launch only waits on these calls when personalization is switched on
+ALEXA_PERSONALIZATION = os.environ.get('ALEXA_PERSONALIZATION', 'false').lower() == 'true'
+#hard per-call deadlines; a slow Alexa API costs the player a missing name, never the turn
+ALEXA_API_CONNECT_TIMEOUT = float(os.environ.get('ALEXA_API_CONNECT_TIMEOUT', '0.3'))
+ALEXA_API_READ_TIMEOUT = float(os.environ.get('ALEXA_API_READ_TIMEOUT', '0.5'))
+ALEXA_API_POOL_SIZE = int(os.environ.get('ALEXA_API_POOL_SIZE', '8'))
+#settings and profile values rarely change; a refused permission is rechecked sooner
+ALEXA_API_TTL_SECONDS = int(os.environ.get('ALEXA_API_TTL_SECONDS', '3600'))
+ALEXA_API_DENIED_TTL_SECONDS = int(os.environ.get('ALEXA_API_DENIED_TTL_SECONDS', '300'))
+ALEXA_API_CACHE_MAX_ENTRIES = int(os.environ.get('ALEXA_API_CACHE_MAX_ENTRIES', '2000'))
+
+_MISSING = object()
+
+
+class ValueCache(object):
+    """Per-device/per-account TTL cache of Alexa API values; None is a cached "not available"."""
+    def __init__(self, max_entries=ALEXA_API_CACHE_MAX_ENTRIES, clock=time.time):
+        self._max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._clock() >= entry[0]:
+                return _MISSING
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, value, ttl_seconds):
+        with self._lock:
+            self._entries[key] = (self._clock() + ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+
+class AlexaApiClient(object):
+    """Settings, Device Address and Customer Profile lookups over one pooled HTTPS session."""
+    def __init__(self, cache=None):
+        self._cache = cache or ValueCache()
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    def _get_session(self):
+        #requests is only imported once a lookup is actually made
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=ALEXA_API_POOL_SIZE, max_retries=0)
+                    session.mount('https://', adapter)
+                    self._session = session
+        return self._session
+
+    def _lookup(self, operation, cache_key, system, path, extract):
+        value = self._cache.get(cache_key)
+        if value is not _MISSING:
+            return value
+        try:
+            response = metrics.timed_call(
+                'AlexaApi', operation, path.split('/')[-1], self._get_session().get, system.api_endpoint + path,
+                headers={'Accept': 'application/json', 'Authorization': 'Bearer {}'.format(system.api_access_token)},
+                timeout=(ALEXA_API_CONNECT_TIMEOUT, ALEXA_API_READ_TIMEOUT))
+        except Exception as e:
+            #timeouts and connection errors are not cached; the next launch tries again
+            logger.warning("Alexa API %s failed: %s", operation, e)
+            return None
+        if response.status_code == 200:
+            value = extract(response.json())
+            self._cache.put(cache_key, value, ALEXA_API_TTL_SECONDS)
+            return value
+        if response.status_code in (204, 403, 404):
+            #no value or no permission granted
+            self._cache.put(cache_key, None, ALEXA_API_DENIED_TTL_SECONDS)
+        else:
+            logger.warning("Alexa API %s returned %s", operation, response.status_code)
+        return None
+
+    def timezone(self, system):
+        # type: (SystemState) -> str
+        device_id = system.device.device_id
+        return self._lookup('GetTimeZone', ('timezone', device_id), system,
+                            "/v2/devices/{}/settings/System.timeZone".format(device_id), lambda data: data)
+
+    def country(self, system):
+        # type: (SystemState) -> str
+        device_id = system.device.device_id
+        return self._lookup('GetCountryAndPostalCode', ('country', device_id), system,
+                            "/v1/devices/{}/settings/address/countryAndPostalCode".format(device_id),
+                            lambda data: data.get('countryCode'))
+
+    def name(self, system):
+        # type: (SystemState) -> str
+        return self._lookup('GetProfileName', ('name', system.user.user_id), system,
+                            "/v2/accounts/~current/settings/Profile.name", lambda data: data)
+
+    def profile_calls(self, system):
+        # type: (SystemState) -> Dict[str, Callable[[], Any]]
+        """Zero-argument lookups to hand to run_parallel alongside a handler's other reads."""
+        return {
+            'timezone': lambda: self.timezone(system),
+            'country': lambda: self.country(system),
+            'name': lambda: self.name(system)
+        }
+
+
+alexa_api = AlexaApiClient()
@@ -0,0 +1,120 @@
+import logging
+import threading
+import time
+
+import data_access
+from content_bundle import get_bundle
+import ssml
+
+logger = logging.getLogger()
+
+CDN_URL = "https://d28n9h2es30znd.cloudfront.net/"
+DEFAULT_VOICE = "Takumi"
+
+#presentation metadata for the launch cities; JPExpCities items can override any of these
+#with PollyVoice, WelcomeAudioUrl and ImageUrl attributes, so new cities only need a table item
+CITY_DEFAULTS = {
+    'Tokyo': {
+        'PollyVoice': "Takumi",
+        'WelcomeAudioUrl': CDN_URL + "rail_starting.mp3",
+        'ImageUrl': CDN_URL + "tokyo_train.jpg"
+    },
+    'Kyoto': {
+        'PollyVoice': "Mizuki",
+        'WelcomeAudioUrl': CDN_URL + "town_morning.mp3",
+        'ImageUrl': CDN_URL + "eikando_lightup.jpeg"
+    }
+}
+
+#don't rescan the table more than once a minute when someone asks for a city we don't know
+RELOAD_INTERVAL_SECONDS = 60
+
+
+class City(object):
+    """A city with its id, name and the voice/audio/imagery used to present it."""
+    def __init__(self, city_id, name, voice=DEFAULT_VOICE, welcome_audio_url=None, image_url=None):
+        self.city_id = city_id
+        self.name = name
+        self.voice = voice
+        self.welcome_audio_url = welcome_audio_url
+        self.image_url = image_url
+        self.fragments = ssml.fragments_for(voice)
+        self.welcome_audio = ssml.audio(welcome_audio_url)
+
+    @classmethod
+    def from_item(cls, item):
+        defaults = CITY_DEFAULTS.get(item['CityName'], {})
+        return cls(
+            item['CityId'],
+            item['CityName'],
+            voice=item.get('PollyVoice', defaults.get('PollyVoice', DEFAULT_VOICE)),
+            welcome_audio_url=item.get('WelcomeAudioUrl', defaults.get('WelcomeAudioUrl')),
+            image_url=item.get('ImageUrl', defaults.get('ImageUrl')))
+
+
+class CityRegistry(object):
+    """Bidirectional name <-> id index of JPExpCities, loaded once per container.
+
+    The first load uses `loader`; the rescans that follow a lookup miss use `reloader`.
+    """
+    def __init__(self, loader, reloader=None, clock=time.time):
+        self._loader = loader
+        self._reloader = reloader or loader
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._by_id = {}
+        self._by_name = {}
+        self._by_folded_name = {}
+        self._loaded_at = None
+
+    def _load(self):
+        loader = self._loader if self._loaded_at is None else self._reloader
+        cities = [City.from_item(item) for item in loader()]
+        with self._lock:
+            self._by_id = dict((city.city_id, city) for city in cities)
+            self._by_name = dict((city.name, city) for city in cities)
+            self._by_folded_name = dict((city.name.casefold(), city) for city in cities)
+            self._loaded_at = self._clock()
+        logger.info("City registry loaded %s cities", len(cities))
+
+    def _lookup(self, find):
+        if self._loaded_at is None:
+            self._load()
+        city = find()
+        #unknown key: the table may have a new city since we loaded, rescan at most once per interval
+        if city is None and self._clock() - self._loaded_at >= RELOAD_INTERVAL_SECONDS:
+            self._load()
+            city = find()
+        return city
+
+    def by_name(self, name):
+        # type: (str) -> City
+        """Return the city for a name (exact match first, then case-insensitive), or None."""
+        if name is None:
+            return None
+        return self._lookup(lambda: self._by_name.get(name) or self._by_folded_name.get(name.casefold()))
+
+    def by_id(self, city_id):
+        # type: (Any) -> City
+        """Return the city for an id, or None."""
+        return self._lookup(lambda: self._by_id.get(city_id))
+
+    def cities(self):
+        if self._loaded_at is None:
+            self._load()
+        return list(self._by_id.values())
+
+
+def scan_cities():
+    return data_access.scan_all('JPExpCities')
+
+
+def load_cities():
+    #the bundled cities answer the first load; a rescan means a lookup missed them, so it reads the table
+    bundle = get_bundle()
+    if bundle is not None:
+        return bundle.cities
+    return scan_cities()
+
+
+city_registry = CityRegistry(load_cities, scan_cities)
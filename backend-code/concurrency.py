@@ -0,0 +1,46 @@
+import concurrent.futures
+import contextvars
+import logging
+import os
+
+logger = logging.getLogger()
+
+#small, bounded pool created once per container and reused by every warm invocation
+HANDLER_POOL_WORKERS = int(os.environ.get('HANDLER_POOL_WORKERS', '4'))
+#time kept back from the Lambda deadline for the handler to build and return its response
+RESERVED_MILLIS = int(os.environ.get('HANDLER_RESERVED_MILLIS', '1000'))
+
+_executor = concurrent.futures.ThreadPoolExecutor(max_workers=HANDLER_POOL_WORKERS, thread_name_prefix='handler')
+
+
+def remaining_seconds(handler_input):
+    # type: (HandlerInput) -> float
+    """Seconds the handler can spend waiting, or None when there is no Lambda context (local runs)."""
+    context = getattr(handler_input, 'context', None)
+    if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+        return None
+    return max(context.get_remaining_time_in_millis() - RESERVED_MILLIS, 0) / 1000.0
+
+
+def run_parallel(calls, handler_input=None):
+    # type: (Dict[str, Callable[[], Any]], HandlerInput) -> Dict[str, Any]
+    """Run independent zero-argument calls on the shared pool and wait for them together.
+
+    Each call runs in a copy of the caller's context, so it sees the current request memo and
+    whatever it reads is a memory hit for the handler afterwards. Calls that fail or don't finish
+    before the Lambda deadline are logged and left out of the result; the handler's own
+    sequential code then does (and fails on) the read as it would have without the fan-out.
+    """
+    futures = dict(
+        (_executor.submit(contextvars.copy_context().run, call), name) for name, call in calls.items())
+    done, not_done = concurrent.futures.wait(futures, timeout=remaining_seconds(handler_input))
+
+    results = {}
+    for future in done:
+        try:
+            results[futures[future]] = future.result()
+        except Exception:
+            logger.error("Parallel call %s failed", futures[future], exc_info=True)
+    for future in not_done:
+        logger.error("Parallel call %s did not finish before the deadline", futures[future])
+    return results
@@ -0,0 +1,90 @@
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger()
+
+#bump when the artifact layout changes; the skill ignores bundles in a layout it can't read
+BUNDLE_FORMAT = 1
+CONTENT_BUNDLE_PATH = os.environ.get(
+    'CONTENT_BUNDLE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'content_bundle.json'))
+#pin the content version the tables are expected to hold; a bundle with any other version is ignored
+#and every read goes to DynamoDB, so content can be updated ahead of a redeploy
+CONTENT_BUNDLE_VERSION = os.environ.get('CONTENT_BUNDLE_VERSION')
+
+
+class ContentBundle(object):
+    """Cities, fun facts and city stories compiled from DynamoDB by tools/compile_content.py."""
+    def __init__(self, version, cities, fun_facts, stories):
+        self.version = version
+        self.cities = cities        # JPExpCities items
+        self.fun_facts = fun_facts  # JPExpFunFacts texts
+        self._stories = stories     # CityId -> (QuestionNumber -> question, QuestionNumber -> detail)
+
+    @classmethod
+    def from_dict(cls, data):
+        stories = {}
+        for city_id, story in data['stories'].items():
+            stories[city_id] = (
+                dict((int(number), item) for number, item in story['questions'].items()),
+                dict((int(number), item) for number, item in story['details'].items()))
+        return cls(data['version'], data['cities'], data['funFacts'], stories)
+
+    def has_city(self, city_id):
+        #stories are keyed by the CityId string (JSON keys), while a city's CityId may be a number
+        return str(city_id) in self._stories
+
+    def story(self, city_id):
+        # type: (Any) -> Tuple[Dict[int, Any], Dict[int, Any]]
+        """Return the (questions, details) of a city, or None when the bundle doesn't have it."""
+        return self._stories.get(str(city_id))
+
+
+def read_bundle(path=CONTENT_BUNDLE_PATH, expected_version=CONTENT_BUNDLE_VERSION):
+    # type: (str, str) -> ContentBundle
+    """Load a bundle, or return None when it is missing, unreadable or not the expected version."""
+    try:
+        with open(path, 'rb') as f:
+            data = json.loads(f.read().decode('utf-8'))
+    except FileNotFoundError:
+        logger.info("No content bundle at %s, reading content from DynamoDB", path)
+        return None
+    except ValueError:
+        logger.error("Cannot parse content bundle %s", path, exc_info=True)
+        return None
+
+    if data.get('format') != BUNDLE_FORMAT:
+        logger.warning("Ignoring content bundle in format %s", data.get('format'))
+        return None
+    if expected_version and data.get('version') != expected_version:
+        logger.warning("Ignoring content bundle %s, expected version %s", data.get('version'), expected_version)
+        return None
+    bundle = ContentBundle.from_dict(data)
+    logger.info("Content bundle %s loaded: %s cities", bundle.version, len(bundle.cities))
+    return bundle
+
+
+_bundle = None
+_bundle_read = False
+_lock = threading.Lock()
+
+
+def get_bundle():
+    # type: () -> ContentBundle
+    """The container's bundle, read on first use; None means everything comes from DynamoDB."""
+    global _bundle, _bundle_read
+    if not _bundle_read:
+        with _lock:
+            if not _bundle_read:
+                _bundle = read_bundle()
+                _bundle_read = True
+    return _bundle
+
+
+def set_bundle(bundle):
+    """Replace the container's bundle (None turns it off); used by the offline tools."""
+    global _bundle, _bundle_read
+    with _lock:
+        _bundle = bundle
+        _bundle_read = True
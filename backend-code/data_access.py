@@ -0,0 +1,307 @@
+import contextvars
+import copy
+import logging
+import os
+import threading
+import time
+
+import boto3
+from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+import metrics
+
+logger = logging.getLogger()
+
+#one DynamoDB resource per container: the session, credentials and connection pool are built once
+#and reused by every invocation instead of on every helper call
+DYNAMODB_CONFIG = Config(
+    connect_timeout=float(os.environ.get('DYNAMODB_CONNECT_TIMEOUT', '1')),
+    read_timeout=float(os.environ.get('DYNAMODB_READ_TIMEOUT', '2')),
+    retries={
+        'mode': 'standard',
+        'max_attempts': int(os.environ.get('DYNAMODB_MAX_ATTEMPTS', '3'))
+    },
+    max_pool_connections=int(os.environ.get('DYNAMODB_MAX_POOL_CONNECTIONS', '10')),
+    tcp_keepalive=True
+)
+
+_lock = threading.RLock()
+_resource = None
+_tables = {}
+
+
+def get_resource():
+    """Return the shared DynamoDB service resource, creating it on first use."""
+    global _resource
+    if _resource is None:
+        with _lock:
+            if _resource is None:
+                logger.info("Creating DynamoDB resource")
+                _resource = boto3.resource('dynamodb', config=DYNAMODB_CONFIG)
+    return _resource
+
+
+def get_table(table_name):
+    # type: (str) -> Any
+    """Return a cached Table handle bound to the shared resource."""
+    table = _tables.get(table_name)
+    if table is None:
+        with _lock:
+            table = _tables.get(table_name)
+            if table is None:
+                table = _tables[table_name] = get_resource().Table(table_name)
+    return table
+
+
+def set_resource(resource):
+    """Swap the DynamoDB resource (e.g. for a local stand-in in tests); pass None to go back to boto3."""
+    global _resource
+    with _lock:
+        _resource = resource
+        _tables.clear()
+
+
+class RequestMemo(object):
+    """Read-through cache that lives for a single skill invocation.
+
+    Results are keyed by table + key, so a handler that asks for the same item twice in one turn
+    only goes to DynamoDB once. A write to a table drops that table's memoized reads.
+    """
+    def __init__(self):
+        self._results = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, memo_key, load):
+        with self._lock:
+            cached = memo_key in self._results
+            if cached:
+                self.hits += 1
+                result = self._results[memo_key]
+            else:
+                self.misses += 1
+        if not cached:
+            #read outside the lock so parallel lookups of different keys overlap
+            result = load()
+            with self._lock:
+                self._results[memo_key] = result
+        #callers mutate the records they get back (e.g. the stats record on the session)
+        return copy.deepcopy(result)
+
+    def invalidate_table(self, table_name):
+        with self._lock:
+            for memo_key in [k for k in self._results if k[0] == table_name]:
+                del self._results[memo_key]
+
+
+_request_memo = contextvars.ContextVar('request_memo', default=None)
+
+
+def begin_request():
+    # type: () -> RequestMemo
+    """Start a fresh memo for the current invocation."""
+    memo = RequestMemo()
+    _request_memo.set(memo)
+    return memo
+
+
+def end_request():
+    # type: () -> RequestMemo
+    """Drop the current invocation's memo and return it (None if there was none)."""
+    memo = _request_memo.get()
+    _request_memo.set(None)
+    return memo
+
+
+def query(table_name, key, index_name=None):
+    # type: (str, Dict[str, Any], str) -> Dict[str, Any]
+    """Query a table (or index) for items whose key attributes equal the given values.
+
+    Inside an invocation the result is memoized, so repeated lookups of the same key are memory hits.
+    """
+    def load():
+        condition = None
+        for name, value in key.items():
+            condition = Key(name).eq(value) if condition is None else condition & Key(name).eq(value)
+        kwargs = {'KeyConditionExpression': condition}
+        if index_name is not None:
+            kwargs['IndexName'] = index_name
+        return _dynamodb('Query', table_name, get_table(table_name).query, **kwargs)
+
+    memo = _request_memo.get()
+    if memo is None:
+        return load()
+    return memo.get_or_load((table_name, index_name, tuple(sorted(key.items()))), load)
+
+
+def batch_get(keys_by_table, max_attempts=4):
+    # type: (Dict[str, List[Dict[str, Any]]], int) -> Dict[str, List[Dict[str, Any]]]
+    """Fetch items from one or more tables in a single BatchGetItem round trip.
+
+    Unprocessed keys (throttling) are retried with a short backoff; items that still can't be
+    read are left out of the result, the same as items that don't exist.
+    """
+    request_items = dict((table_name, {'Keys': keys}) for table_name, keys in keys_by_table.items() if keys)
+    items = dict((table_name, []) for table_name in request_items)
+    for attempt in range(max_attempts):
+        if not request_items:
+            break
+        if attempt:
+            time.sleep(0.025 * (2 ** attempt))
+        response = _dynamodb('BatchGetItem', ','.join(sorted(request_items)), get_resource().batch_get_item,
+                             RequestItems=request_items)
+        for table_name, table_items in response.get('Responses', {}).items():
+            items[table_name].extend(table_items)
+        request_items = response.get('UnprocessedKeys') or {}
+    if request_items:
+        logger.error("BatchGetItem left keys unprocessed: %s", request_items)
+    return items
+
+
+def get_item(table_name, key):
+    # type: (str, Dict[str, Any]) -> Dict[str, Any]
+    """Read one item by its full primary key (None if it doesn't exist), memoized within the invocation."""
+    def load():
+        return _dynamodb('GetItem', table_name, get_table(table_name).get_item, Key=key).get('Item')
+
+    memo = _request_memo.get()
+    if memo is None:
+        return load()
+    return memo.get_or_load((table_name, 'GetItem', tuple(sorted(key.items()))), load)
+
+
+def query_all(table_name, key_name, key_value):
+    # type: (str, str, Any) -> List[Dict[str, Any]]
+    """Read every item under one partition key, following pagination (not memoized)."""
+    table = get_table(table_name)
+    kwargs = {'KeyConditionExpression': Key(key_name).eq(key_value)}
+    items = []
+    while True:
+        page = _dynamodb('Query', table_name, table.query, **kwargs)
+        items.extend(page['Items'])
+        if 'LastEvaluatedKey' not in page:
+            return items
+        kwargs['ExclusiveStartKey'] = page['LastEvaluatedKey']
+
+
+def scan_all(table_name):
+    # type: (str) -> List[Dict[str, Any]]
+    """Read every item of a (small, reference-data) table, following pagination."""
+    table = get_table(table_name)
+    kwargs = {}
+    items = []
+    while True:
+        page = _dynamodb('Scan', table_name, table.scan, **kwargs)
+        items.extend(page['Items'])
+        if 'LastEvaluatedKey' not in page:
+            return items
+        kwargs['ExclusiveStartKey'] = page['LastEvaluatedKey']
+
+
+def put_item(table_name, **kwargs):
+    _invalidate(table_name)
+    return _dynamodb('PutItem', table_name, get_table(table_name).put_item, **kwargs)
+
+
+def update_item(table_name, **kwargs):
+    _invalidate(table_name)
+    return _dynamodb('UpdateItem', table_name, get_table(table_name).update_item, **kwargs)
+
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+#BatchWriteItem's limit on requests per call
+BATCH_WRITE_LIMIT = 25
+
+
+def batch_put(table_name, items, max_attempts=6):
+    # type: (str, List[Dict[str, Any]], int) -> List[Dict[str, Any]]
+    """Put up to BATCH_WRITE_LIMIT items into one table in a single BatchWriteItem round trip.
+
+    Unprocessed items (throttling) are retried with a backoff; the ones still unwritten after
+    max_attempts are returned, so callers (offline tools) can report or retry them.
+    """
+    if len(items) > BATCH_WRITE_LIMIT:
+        raise ValueError("BatchWriteItem takes at most {} items, got {}".format(BATCH_WRITE_LIMIT, len(items)))
+    _invalidate(table_name)
+    requests = [{'PutRequest': {'Item': _serialize(item)}} for item in items]
+    for attempt in range(max_attempts):
+        if not requests:
+            break
+        if attempt:
+            time.sleep(0.05 * (2 ** attempt))
+        response = _dynamodb('BatchWriteItem', table_name, get_resource().meta.client.batch_write_item,
+                             RequestItems={table_name: requests})
+        requests = (response.get('UnprocessedItems') or {}).get(table_name, [])
+    return [dict((name, _deserializer.deserialize(value)) for name, value in request['PutRequest']['Item'].items())
+            for request in requests]
+
+
+def write_transaction(items):
+    # type: (List[Dict[str, Any]]) -> bool
+    """Apply one or more conditional writes as a single write.
+
+    Items use the TransactWriteItems shape ({'Put': {...}} or {'Update': {...}}, each with a
+    TableName) but plain Python values. A lone item is sent as a plain PutItem/UpdateItem
+    (transactions cost twice the write capacity); several go out together in one
+    TransactWriteItems so they either all apply or none do. Returns False when a condition
+    check fails.
+    """
+    for item in items:
+        _invalidate(list(item.values())[0]['TableName'])
+
+    if len(items) == 1:
+        (action, request), = items[0].items()
+        request = dict(request)
+        table_name = request.pop('TableName')
+        try:
+            if action == 'Put':
+                _dynamodb('PutItem', table_name, get_table(table_name).put_item, **request)
+            else:
+                _dynamodb('UpdateItem', table_name, get_table(table_name).update_item, **request)
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            raise
+        return True
+
+    transact_items = []
+    for item in items:
+        (action, request), = item.items()
+        request = dict(request)
+        for field in ('Key', 'Item', 'ExpressionAttributeValues'):
+            if field in request:
+                request[field] = _serialize(request[field])
+        transact_items.append({action: request})
+    try:
+        table_names = ','.join(sorted(set(list(item.values())[0]['TableName'] for item in items)))
+        _dynamodb('TransactWriteItems', table_names, get_resource().meta.client.transact_write_items,
+                  TransactItems=transact_items)
+    except ClientError as e:
+        reasons = e.response.get('CancellationReasons', [])
+        if e.response['Error']['Code'] == 'TransactionCanceledException' and \
+                any(reason.get('Code') == 'ConditionalCheckFailed' for reason in reasons):
+            return False
+        raise
+    return True
+
+
+def _dynamodb(operation, table_name, fn, **kwargs):
+    #every DynamoDB call is timed and its consumed capacity recorded for the invocation's metrics
+    kwargs['ReturnConsumedCapacity'] = 'TOTAL'
+    return metrics.timed_call('DynamoDB', operation, table_name, fn, **kwargs)
+
+
+def _serialize(values):
+    return dict((name, _serializer.serialize(value)) for name, value in values.items())
+
+
+def _invalidate(table_name):
+    memo = _request_memo.get()
+    if memo is not None:
+        memo.invalidate_table(table_name)
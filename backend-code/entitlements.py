@@ -0,0 +1,62 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from ask_sdk_model.services.monetization import EntitledState
+
+logger = logging.getLogger()
+
+ENTITLEMENT_TTL_SECONDS = int(os.environ.get('ENTITLEMENT_TTL_SECONDS', '60'))
+ENTITLEMENT_CACHE_MAX_USERS = int(os.environ.get('ENTITLEMENT_CACHE_MAX_USERS', '1000'))
+
+
+def summarize_products(isp_response):
+    # type: (InSkillProductsResponse) -> List[Dict[str, Any]]
+    """Reduce an InSkillProductsResponse to the few fields the skill uses, as session-friendly dicts."""
+    return [
+        {
+            'productId': product.product_id,
+            'summary': product.summary,
+            'entitled': product.entitled == EntitledState.ENTITLED
+        }
+        for product in isp_response.in_skill_products
+    ]
+
+
+class EntitlementCache(object):
+    """Short-lived per-user, per-locale cache of in-skill product summaries.
+
+    Purchases and refunds invalidate the user's entries, so the TTL only bounds how long a change
+    made outside the skill (e.g. a refund through the Alexa app) can go unnoticed.
+    """
+    def __init__(self, ttl_seconds=ENTITLEMENT_TTL_SECONDS, max_entries=ENTITLEMENT_CACHE_MAX_USERS, clock=time.time):
+        self._ttl = ttl_seconds
+        self._max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, user_id, locale):
+        with self._lock:
+            entry = self._entries.get((user_id, locale))
+            if entry is None or self._clock() - entry[0] >= self._ttl:
+                return None
+            self._entries.move_to_end((user_id, locale))
+            return entry[1]
+
+    def put(self, user_id, locale, products):
+        with self._lock:
+            self._entries[(user_id, locale)] = (self._clock(), products)
+            self._entries.move_to_end((user_id, locale))
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == user_id]:
+                del self._entries[key]
+
+
+entitlement_cache = EntitlementCache()
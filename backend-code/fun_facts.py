@@ -0,0 +1,74 @@
+import logging
+import os
+import random
+import threading
+import time
+
+import data_access
+from content_bundle import get_bundle
+
+logger = logging.getLogger()
+
+FALLBACK_FACT = "Nagasaki is known for its delicious Japanese sake."
+#how long a warm container serves its facts before reloading them, as StoryCache does for stories
+FUN_FACT_TTL_SECONDS = int(os.environ.get('FUN_FACT_TTL_SECONDS', '900'))
+
+
+class FunFactPool(object):
+    """Every fun fact held in memory so the goodbye path rarely waits on DynamoDB.
+
+    The pool is loaded on first use and reloaded by the first request that finds it older than
+    the TTL; other requests keep serving the current facts meanwhile, and if the reload fails
+    they are served until the TTL passes again.
+    """
+    def __init__(self, loader, ttl_seconds=FUN_FACT_TTL_SECONDS, clock=time.time):
+        self._loader = loader
+        self._ttl = ttl_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._facts = []
+        self._loaded_at = 0
+
+    def load(self):
+        facts = self._loader()
+        with self._lock:
+            self._facts = facts
+            self._loaded_at = self._clock()
+        logger.info("Fun fact pool loaded %s facts", len(facts))
+
+    def warm(self):
+        """Load the pool if it is still cold; used to overlap the load with other launch reads."""
+        if not self._facts:
+            self.load()
+
+    def _claim_reload(self):
+        with self._lock:
+            if self._facts and self._clock() - self._loaded_at < self._ttl:
+                return False
+            if self._facts:
+                #restart the TTL now so concurrent requests don't all reload
+                self._loaded_at = self._clock()
+            return True
+
+    def sample(self):
+        # type: () -> str
+        """Return a random fact; the fallback fact is only used when the pool is cold and can't be loaded."""
+        if self._claim_reload():
+            try:
+                self.load()
+            except Exception:
+                logger.error("Cannot load fun facts", exc_info=True)
+        facts = self._facts
+        if not facts:
+            return FALLBACK_FACT
+        return random.choice(facts)
+
+
+def load_fun_facts():
+    bundle = get_bundle()
+    if bundle is not None:
+        return list(bundle.fun_facts)
+    return [item['Text'] for item in data_access.scan_all('JPExpFunFacts')]
+
+
+fun_fact_pool = FunFactPool(load_fun_facts)
@@ -0,0 +1,68 @@
+from collections import namedtuple
+
+#the rules of a journey, free of I/O: the handlers feed it story items and session levels.
+#tools/simulate_story.py plays the same rules over NumPy arrays, so a change here must be
+#mirrored there (its --verify option replays sample paths through this module to check)
+
+STARTING_MONEY = 50
+STARTING_ENERGY = 50
+#at or below this the guide warns the player before the next question
+WARNING_LEVEL = 10
+
+YES = 'Yes'
+NO = 'No'
+#the JPExpStoryDetails text attribute spoken for each answer
+RESPONSE_TEXT = {YES: 'YesResponseText', NO: 'NoResponseText'}
+
+CONTINUE = 'continue'
+WARNING = 'warning'
+GAME_OVER = 'game_over'
+
+Levels = namedtuple('Levels', ['question_number', 'current_turns', 'money_level', 'energy_level'])
+Turn = namedtuple('Turn', ['levels', 'outcome'])
+
+
+def starting_levels():
+    # type: () -> Levels
+    return Levels(0, 0, STARTING_MONEY, STARTING_ENERGY)
+
+
+def answer_for_text(text_type):
+    # type: (str) -> str
+    """Map the handlers' 'YesResponseText'/'NoResponseText' to YES/NO."""
+    for answer, text in RESPONSE_TEXT.items():
+        if text == text_type:
+            return answer
+    raise ValueError("Unknown response text type {}".format(text_type))
+
+
+def impact(detail, answer):
+    # type: (Dict[str, Any], str) -> Tuple[int, int]
+    """The (wealth, energy) change an answer to a story detail causes."""
+    return int(detail[answer + 'WealthImpact']), int(detail[answer + 'EnergyImpact'])
+
+
+def is_game_over(money_level, energy_level, active=True):
+    return not active or money_level <= 0 or energy_level <= 0
+
+
+def is_warning_needed(money_level, energy_level):
+    return money_level <= WARNING_LEVEL or energy_level <= WARNING_LEVEL
+
+
+def play_turn(levels, detail, answer, active=True):
+    # type: (Levels, Dict[str, Any], str, bool) -> Turn
+    """Answer the story detail of question levels.question_number + 1 and return the new levels.
+
+    A journey that has already ended (active=False) is over whatever the answer: the levels are returned unchanged.
+    """
+    if not active:
+        return Turn(levels, GAME_OVER)
+    wealth, energy = impact(detail, answer)
+    levels = Levels(levels.question_number + 1, levels.current_turns + 1,
+                    levels.money_level + wealth, levels.energy_level + energy)
+    if is_game_over(levels.money_level, levels.energy_level):
+        return Turn(levels, GAME_OVER)
+    if is_warning_needed(levels.money_level, levels.energy_level):
+        return Turn(levels, WARNING)
+    return Turn(levels, CONTINUE)
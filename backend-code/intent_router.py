@@ -0,0 +1,57 @@
+from ask_sdk_core.dispatch_components import AbstractRequestHandler
+
+#request types whose routing key includes a name: the intent, or the Connections.Response name
+_NAME_OF = {
+    'IntentRequest': lambda request: request.intent.name,
+    'Connections.Response': lambda request: request.name
+}
+
+
+def routing_key(request):
+    # type: (Request) -> Tuple[str, str]
+    name_of = _NAME_OF.get(request.object_type)
+    return request.object_type, name_of(request) if name_of is not None else None
+
+
+class IntentRouter(AbstractRequestHandler):
+    """One request handler that finds the skill's handler with a dict lookup.
+
+    The ASK dispatcher asks every registered handler's can_handle in turn; registered as the only
+    request handler, the router keeps that cost flat however many intents the skill grows.
+    """
+    def __init__(self):
+        self._routes = {}
+        self._handlers = []
+
+    def add(self, handler, request_type, *names):
+        # type: (AbstractRequestHandler, str, str) -> IntentRouter
+        """Route request_type (with any of the intent/Connections.Response names given) to handler."""
+        keys = [(request_type, name) for name in names] or [(request_type, None)]
+        for key in keys:
+            if key in self._routes:
+                raise ValueError("{} is already routed to {}".format(key, type(self._routes[key]).__name__))
+            self._routes[key] = handler
+        if handler not in self._handlers:
+            self._handlers.append(handler)
+        return self
+
+    def handlers(self):
+        # type: () -> List[AbstractRequestHandler]
+        """The routed handlers in the order they were added."""
+        return list(self._handlers)
+
+    def routes(self):
+        # type: () -> Dict[Tuple[str, str], AbstractRequestHandler]
+        return dict(self._routes)
+
+    def route(self, handler_input):
+        # type: (HandlerInput) -> AbstractRequestHandler
+        return self._routes.get(routing_key(handler_input.request_envelope.request))
+
+    def can_handle(self, handler_input):
+        # type: (HandlerInput) -> bool
+        return self.route(handler_input) is not None
+
+    def handle(self, handler_input):
+        # type: (HandlerInput) -> Response
+        return self.route(handler_input).handle(handler_input)
@@ -1,44 +1,52 @@
 import logging
 import json
 import os
-import boto3
-import requests
 from random import randint
 import datetime as dt
-from botocore.exceptions import ClientError
-from boto3.dynamodb.conditions import Key, Attr
 
 #from ask_sdk_core.skill_builder import SkillBuilder
 from ask_sdk_core.skill_builder import CustomSkillBuilder
-from ask_sdk_core.api_client import DefaultApiClient
+from ask_sdk_model.services import ApiClient
 
 from ask_sdk_core.dispatch_components import AbstractRequestHandler
 from ask_sdk_core.dispatch_components import AbstractExceptionHandler
 from ask_sdk_core.dispatch_components import AbstractResponseInterceptor
 from ask_sdk_core.dispatch_components import AbstractRequestInterceptor
-from ask_sdk_core.handler_input import HandlerInput
 from ask_sdk_core.response_helper import get_plain_text_content
-from ask_sdk_model.ui import SimpleCard
 from ask_sdk_model import ui
 from ask_sdk_model.interfaces.display import (
     ImageInstance, Image, RenderTemplateDirective,
     BackButtonBehavior, BodyTemplate2)
-from ask_sdk_model import Response
 from ask_sdk_core.exceptions import AskSdkException
 import ask_sdk_core.utils as ask_utils
 from ask_sdk_model.interfaces.alexa.presentation.apl import (
     RenderDocumentDirective)
-from ask_sdk_core.utils import viewport, is_request_type
-from ask_sdk_model.services.monetization import (
-    EntitledState, PurchasableState, InSkillProductsResponse, Error,
-    InSkillProduct)
+from ask_sdk_core.utils import is_request_type
 from ask_sdk_model.interfaces.monetization.v1 import PurchaseResult
 from ask_sdk_model.interfaces.connections import SendRequestDirective
+import data_access
+import metrics
+import skill_logging
+import ssml
+import game_engine
+import persistence
+import player_store
+from story_cache import story_cache, STORY_PREFETCH_QUESTIONS
+from city_registry import city_registry, DEFAULT_VOICE
+from fun_facts import fun_fact_pool
+from entitlements import entitlement_cache, summarize_products
+from concurrency import run_parallel
+from intent_router import IntentRouter
+from alexa_api import alexa_api, ALEXA_PERSONALIZATION
+from response_templates import ResponseTemplate, FrozenSerializer, deep_freeze, lambda_handler
+from session_state import (
+    UserState, JourneyState, session_user, session_journey, set_session_user,
+    set_session_journey, flush_session_state)
 
 logger = logging.getLogger()
 #retrieve logging level from lambda environmet properties
 level = os.environ['LOG_LEVEL']
-logger.setLevel(int(level))
+skill_logging.configure(logger, level)
 
 WELCOME_MESSAGE = "Unleash your inner explorer and get to know the cities of Japan." \
     "On your cultural journey, you start with <break time='0.2s'/>" \
@@ -52,6 +60,21 @@ WELCOME_MESSAGE = "Unleash your inner explorer and get to know the cities of Jap
 VISIT_CITY_REPROMPT = "Do you want to explore <voice name=\"Takumi\"><lang xml:lang=\"ja-JP\">Tokyo</lang></voice> or <voice name=\"Mizuki\"><lang xml:lang=\"ja-JP\">Kyoto</lang></voice>?"
 YES_OR_N0_REPROMPTS = ['Do not stall explorer! Please answer yes or no. If you need a travel tip, say speak to the guide.','Be careful explorer, is your answer yes or no.','You are running out of time explorer! Please answer yes or no.','Explorer, is your answer yes or no. If you need a travel tip, say speak to the guide.','Yes or No, explorer! If you need a travel tip, say speak to the guide.']
 GAME_END = "The next question could not be found for your journey. You have reached the end."
+GAME_OVER_MESSAGE = "Oh no explorer, you don't have enough wealth or energy to continue on your journey! This means your journey is over."
+LOW_LEVELS_WARNING = "Be careful explorer, you are running low on wealth or energy. If you need a travel tip, say speak to the guide."
+#value of the ActiveCityId pointer on the user's profile when the player has no active journey
+NO_ACTIVE_JOURNEY = "-"
+HELP_MESSAGE = "Hello, explorer! It's good to see you! To play this game, start by saying, visit <lang xml:lang=\"ja-JP\">Tokyo</lang> or visit <lang xml:lang=\"ja-JP\">Kyoto</lang>. If you're stuck on a hard level, say speak to the guide. Don't forget that your wealth or energy either increase or decrease based on the choices you make while on your journey. When you run out of either, the game ends."
+FALLBACK_MESSAGE = "Sorry. I cannot help with that. I can help you " \
+    "continue on your journey by saying explore <lang xml:lang=\"ja-JP\">Tokyo</lang> or vist <lang xml:lang=\"ja-JP\">Kyoto</lang>."
+FALLBACK_REPROMPT = "I didn't catch that. What can I help you with?"
+#spoken by CatchAllExceptionHandler whenever a handler fails
+ERROR_MESSAGE = "Sorry, I had trouble doing what you asked. Please try again."
+
+#responses that never change (or only by the fun fact) are built once per container
+HELP_RESPONSE = ResponseTemplate(HELP_MESSAGE, reprompt=HELP_MESSAGE)
+FALLBACK_RESPONSE = ResponseTemplate(FALLBACK_MESSAGE, reprompt=FALLBACK_REPROMPT)
+GOODBYE_RESPONSE = ResponseTemplate("Goodbye!{}. New journeys to Sapporo, Nagasaki, and Okinawa coming soon!")
 
 #Handler for skill launch with no intent
 class LaunchRequestHandler(AbstractRequestHandler):
@@ -61,13 +84,21 @@ class LaunchRequestHandler(AbstractRequestHandler):
 
     def handle(self, handler_input):
         # type: (HandlerInput) -> Response
-        logger.info("In LaunchRequestHandler")
-        # logger.info("The user's timezone is {} ".format(get_user_timezone(handler_input)))
-        # logger.info("The user's country is {} ".format(get_user_country(handler_input)))
-        # logger.info("The user's name is {} ".format(get_user_name(handler_input)))
-        # logger.info("The user's location is {} ".format(get_user_location(handler_input)))
+        logger.debug("In LaunchRequestHandler")
         response_builder = handler_input.response_builder
         include_display(handler_input)
+        system = handler_input.request_envelope.context.system
+
+        #independent reads run together; the checks below are then served from memory
+        calls = {
+            'user': lambda: get_user(system.user.user_id),
+            'cities': city_registry.cities,
+            'fun_facts': fun_fact_pool.warm
+        }
+        if ALEXA_PERSONALIZATION:
+            calls.update(alexa_api.profile_calls(system))
+        results = run_parallel(calls, handler_input)
+        logger.debug("The user's timezone is %s, country is %s", results.get('timezone'), results.get('country'))
 
         #is returning user
         if is_returning_user(handler_input):
@@ -80,7 +111,7 @@ class LaunchRequestHandler(AbstractRequestHandler):
                 speak_output = "Welcome back, explorer! You don't have an active journey. " + VISIT_CITY_REPROMPT
                 reprompt_output = VISIT_CITY_REPROMPT
         else:
-            add_new_user(handler_input.request_envelope.context.system)
+            add_new_user(system, name=results.get('name'), country=results.get('country'))
             speak_output = WELCOME_MESSAGE
             reprompt_output = VISIT_CITY_REPROMPT
 
@@ -99,32 +130,37 @@ class StartJapanExplorerIntentHandler(AbstractRequestHandler):
         include_display(handler_input)
 
         try:
+            #read the user record while loading the story for the requested city
+            if not is_user_on_session(handler_input):
+                run_parallel({
+                    'user': lambda: get_user(handler_input.request_envelope.context.system.user.user_id),
+                    'story': lambda: prefetch_story(get_slot_city(handler_input))
+                }, handler_input)
+
             #if user is already on the session, find current journey stats and ask the next Yes/No question
             if is_user_on_session(handler_input):
-                logger.info("User is on session, continuing journey") 
+                logger.debug("User is on session, continuing journey") 
                 speak_output = continue_journey(handler_input)  
                 reprompt_output = YES_OR_N0_REPROMPTS[randint(0, len(YES_OR_N0_REPROMPTS)-1)] 
             else: #if user is not on session are they a new user or do they have an active journey
                 #is new user
                 if is_returning_user(handler_input):
-                    logger.info("Returning user, checking if there's an active journey") 
+                    logger.debug("Returning user, checking if there's an active journey") 
                     #find current journey stats and ask the next Yes/No question
                     #if active journey; welcome back to journey
                     if has_active_journey(handler_input):
-                        logger.info("User has an active journey, continouing journey") 
+                        logger.debug("User has an active journey, continouing journey") 
                         speak_output = continue_journey(handler_input)
                         reprompt_output = YES_OR_N0_REPROMPTS[randint(0, len(YES_OR_N0_REPROMPTS)-1)] 
                     else:
-                        logger.info("User on session doesn't have an active journey. Prompting for city") 
+                        logger.debug("User on session doesn't have an active journey. Prompting for city") 
                         start_new_journey(handler_input) 
-                        speak_output = get_next_question(handler_input.attributes_manager.session_attributes["city"],handler_input.attributes_manager.session_attributes["stats_record"],handler_input)  
+                        speak_output = get_next_question(handler_input.attributes_manager.session_attributes["city"],session_journey(handler_input),handler_input)  
 
                         #Determine city and play correct audio via SSML
-                        logger.info("Trying to figure out city. Getting city attribute to speak out in correct voice") 
-                        if handler_input.attributes_manager.session_attributes["city"] == 'Tokyo':
-                            speak_output = "<audio src=\"https://d28n9h2es30znd.cloudfront.net/rail_starting.mp3\" /> <voice name=\"Takumi\"><lang xml:lang=\"ja-JP\">ようこそ</lang></voice> Welcome to your new Tokyo journey!" + speak_output 
-                        elif handler_input.attributes_manager.session_attributes["city"] == 'Kyoto':
-                            speak_output = "<audio src=\"https://d28n9h2es30znd.cloudfront.net/town_morning.mp3\" /><voice name=\"Mizuki\"><lang xml:lang=\"ja-JP\">ようこそ</lang></voice> Welcome to your new Tokyo journey!" + speak_output 
+                        logger.debug("Trying to figure out city. Getting city attribute to speak out in correct voice") 
+                        city = city_registry.by_name(handler_input.attributes_manager.session_attributes["city"])
+                        speak_output = ssml.compose(city.welcome_audio, city.fragments.welcome, " Welcome to your new ", city.name, " journey!", speak_output)
                         reprompt_output = YES_OR_N0_REPROMPTS[randint(0, len(YES_OR_N0_REPROMPTS)-1)]  
                 else:
                     add_new_user(handler_input.request_envelope.context.system)
@@ -132,7 +168,7 @@ class StartJapanExplorerIntentHandler(AbstractRequestHandler):
                     speak_output = WELCOME_MESSAGE
                     reprompt_output = VISIT_CITY_REPROMPT
         except:
-            logger.error("An error in StartJapanExplorerIntentHandler for text type {} ".format(handler_input)) 
+            logger.error("An error in StartJapanExplorerIntentHandler", exc_info=True) 
             speak_output = "Sorry, explorer! I don't understand what you want to do. That city is probably not supported yet. {}".format(VISIT_CITY_REPROMPT)
             reprompt_output = VISIT_CITY_REPROMPT
 
@@ -159,11 +195,11 @@ class YesIntentHandler(AbstractRequestHandler):
         speak_output = getYesorNoResponse(handler_input, 'YesResponseText') 
         
         try:
-            if is_game_over(handler_input.attributes_manager.session_attributes["stats_record"]) == False:
+            if is_game_over(session_journey(handler_input)) == False:
                 reprompt_output = YES_OR_N0_REPROMPTS[randint(0, len(YES_OR_N0_REPROMPTS)-1)]
                 handler_input.response_builder.ask(reprompt_output)
         except:
-            logger.error("An error in YesIntentHandler {}".format(handler_input)) 
+            logger.error("An error in YesIntentHandler", exc_info=True) 
             speak_output = "Sorry, explorer! I don't understand what you want to do. {} If so, say visit <lang xml:lang=\"ja-JP\">Tokyo</lang> or <lang xml:lang=\"ja-JP\">Kyoto</lang>.".format(VISIT_CITY_REPROMPT)
 
         return (
@@ -186,11 +222,11 @@ class NoIntentHandler(AbstractRequestHandler):
         speak_output = getYesorNoResponse(handler_input, 'NoResponseText')
 
         try:
-            if is_game_over(handler_input.attributes_manager.session_attributes["stats_record"]) == False:
+            if is_game_over(session_journey(handler_input)) == False:
                 reprompt_output = YES_OR_N0_REPROMPTS[randint(0, len(YES_OR_N0_REPROMPTS)-1)]
                 handler_input.response_builder.ask(reprompt_output)
         except:
-            logger.error("An error in NoIntentHandler {}".format(handler_input)) 
+            logger.error("An error in NoIntentHandler", exc_info=True) 
             speak_output = "Sorry, explorer! I don't understand what you want to do. {} If so, say visit <lang xml:lang=\"ja-JP\">Tokyo</lang> or <lang xml:lang=\"ja-JP\">Kyoto</lang>.".format(VISIT_CITY_REPROMPT)
 
         return (
@@ -209,21 +245,22 @@ class SpeakToGuideIntentHandler(AbstractRequestHandler):
         
         # type: (HandlerInput) -> Response
         #retrieve ISP products on session
-        logger.info("in SpeachToGuideIntentHandler") 
+        logger.debug("in SpeachToGuideIntentHandler") 
 
         try:
             #list of products associated to the skill
-            isp_response = get_isp_products(handler_input)
+            products = get_isp_products(handler_input)
             response_builder = handler_input.response_builder
 
             #check to see if user has a previously purchased a travel tip
-            if is_user_entitled(isp_response):
-                logger.info("in SpeachToGuideIntentHandler - user is entitled") 
+            if is_user_entitled(products):
+                logger.debug("in SpeachToGuideIntentHandler - user is entitled") 
                 #if yes, let them use it
-                tip_for_question = get_tip_for_question(handler_input.attributes_manager.session_attributes["city"], handler_input.attributes_manager.session_attributes["stats_record"], handler_input)
-                next_question = get_next_question(handler_input.attributes_manager.session_attributes["city"], handler_input.attributes_manager.session_attributes["stats_record"],handler_input)
-                speak_output = "<voice name=\""+ get_polly_voice(handler_input.attributes_manager.session_attributes["city"]) + "\"><lang xml:lang=\"ja-JP\">こんにちわ</lang></voice>" + tip_for_question + next_question  
-                reprompt_output = "<voice name=\""+ get_polly_voice(handler_input.attributes_manager.session_attributes["city"]) + "\"> <lang xml:lang=\"ja-JP\">頑張って</lang></voice>" + tip_for_question + next_question 
+                tip_for_question = get_tip_for_question(handler_input.attributes_manager.session_attributes["city"], session_journey(handler_input), handler_input)
+                next_question = get_next_question(handler_input.attributes_manager.session_attributes["city"], session_journey(handler_input),handler_input)
+                fragments = get_voice_fragments(handler_input.attributes_manager.session_attributes["city"])
+                speak_output = ssml.compose(fragments.hello, tip_for_question, next_question)
+                reprompt_output = ssml.compose(fragments.good_luck, tip_for_question, next_question)
                 include_display(handler_input)
                 
                 return (
@@ -233,25 +270,25 @@ class SpeakToGuideIntentHandler(AbstractRequestHandler):
                         .response
                 )
             else:
-                logger.info("in SpeachToGuideIntentHandler - user not entitled") 
-                logger.info("in SpeachToGuideIntentHandler - Skill Prodcuct Summary: {}".format(isp_response.in_skill_products[0].summary)) 
+                logger.debug("in SpeachToGuideIntentHandler - user not entitled") 
+                logger.debug("in SpeachToGuideIntentHandler - Skill Prodcuct Summary: %s", products[0]['summary']) 
                 #if not, upsell (sell) it to them
-                upsell_msg = ("You don't currently own {}. Want to learn more?").format(isp_response.in_skill_products[0].summary)
-                logger.info("in SpeachToGuideIntentHandler - upsell_msg: {}".format(upsell_msg)) 
+                upsell_msg = ("You don't currently own {}. Want to learn more?").format(products[0]['summary'])
+                logger.debug("in SpeachToGuideIntentHandler - upsell_msg: %s", upsell_msg) 
                 include_display(handler_input)
                             
                 return response_builder.add_directive(
                         SendRequestDirective(name="Upsell",
                                     payload={
                                         "InSkillProduct": {
-                                            "productId": isp_response.in_skill_products[0].product_id,
+                                            "productId": products[0]['productId'],
                                         },
                                         "upsellMessage": upsell_msg,
                                     },
                                     token="correlationToken")
                             ).response
         except:
-            logger.error("An error in SpeakToGuideIntentHandler for text type {} ".format(handler_input)) 
+            logger.error("An error in SpeakToGuideIntentHandler", exc_info=True) 
             speak_output = "A tip is not available at this time. Make sure that you are in active game play. Say visit Tokyo or visit Kyoto"
             reprompt_output = "Would you like to visit Tokyo or Kyoto?"
             return (
@@ -270,33 +307,37 @@ class UpsellResponseHandler(AbstractRequestHandler):
 
     def handle(self, handler_input):
 
-        logger.info("in UpsellResponseHandler") 
+        logger.debug("in UpsellResponseHandler") 
         # type: (HandlerInput) -> Response
         response_builder = handler_input.response_builder
         include_display(handler_input)
 
         if handler_input.request_envelope.request.status.code == "200":
-            logger.info("in UpsellResponseHandler - response successful 200") 
-            logger.info("Purchase Result: {}".format(handler_input.request_envelope.request.payload.get("purchaseResult")))
+            logger.debug("in UpsellResponseHandler - response successful 200") 
+            logger.info("Purchase Result: %s", handler_input.request_envelope.request.payload.get("purchaseResult"))
+            if handler_input.request_envelope.request.payload.get("purchaseResult") in (PurchaseResult.ACCEPTED.value, PurchaseResult.ALREADY_PURCHASED.value):
+                #the cached entitlement summary is stale now
+                entitlement_cache.invalidate(handler_input.request_envelope.context.system.user.user_id)
+                handler_input.attributes_manager.session_attributes.pop("products", None)
             if is_returning_user(handler_input) and has_active_journey(handler_input):
-                logger.info("in UpsellResponseHandler - is returning user and has active journey") 
+                logger.debug("in UpsellResponseHandler - is returning user and has active journey") 
                 if handler_input.request_envelope.request.payload.get("purchaseResult") == PurchaseResult.DECLINED.value:
-                    logger.info("in UpsellResponseHandler purchase DECLINED") 
+                    logger.debug("in UpsellResponseHandler purchase DECLINED") 
                     speech = ("Let me repeat the question: {}".format(
-                    get_next_question(handler_input.attributes_manager.session_attributes["city"], handler_input.attributes_manager.session_attributes["stats_record"],handler_input)))
+                    get_next_question(handler_input.attributes_manager.session_attributes["city"], session_journey(handler_input),handler_input)))
                     reprompt = YES_OR_N0_REPROMPTS[randint(0, len(YES_OR_N0_REPROMPTS)-1)]  
                     return response_builder.speak(speech).ask(reprompt).response          
                 elif handler_input.request_envelope.request.payload.get("purchaseResult") == PurchaseResult.ACCEPTED.value or handler_input.request_envelope.request.payload.get("purchaseResult") == PurchaseResult.ALREADY_PURCHASED.value:
-                    logger.info("in UpsellResponseHandler purchase ACCEPTED") 
-                    speech = ("Your exploring tip is: {}. {}".format(get_tip_for_question(handler_input.attributes_manager.session_attributes["city"], handler_input.attributes_manager.session_attributes["stats_record"], handler_input),
-                            get_next_question(handler_input.attributes_manager.session_attributes["city"], handler_input.attributes_manager.session_attributes["stats_record"],handler_input)))
+                    logger.debug("in UpsellResponseHandler purchase ACCEPTED") 
+                    speech = ("Your exploring tip is: {}. {}".format(get_tip_for_question(handler_input.attributes_manager.session_attributes["city"], session_journey(handler_input), handler_input),
+                            get_next_question(handler_input.attributes_manager.session_attributes["city"], session_journey(handler_input),handler_input)))
                     reprompt = YES_OR_N0_REPROMPTS[randint(0, len(YES_OR_N0_REPROMPTS)-1)]  
                     return response_builder.speak(speech).ask(reprompt).response
                 elif handler_input.request_envelope.request.payload.get("purchaseResult") == PurchaseResult.ERROR.value:
-                    logger.info("Connections.Response indicated failure. Error: {}".format(handler_input.request_envelope.request.payload.get("message")))
+                    logger.info("Connections.Response indicated failure. Error: %s", handler_input.request_envelope.request.payload.get("message"))
                     return response_builder.speak("There was an error handling your Upsell request. Please try again or contact us for help.").response
         else:
-            logger.log("Connections.Response indicated failure. Error: {}".format(handler_input.request_envelope.request.status.message))
+            logger.warning("Connections.Response indicated failure. Error: %s", handler_input.request_envelope.request.status.message)
             return response_builder.speak(
                 "There was an error handling your Upsell request. "
                 "Please try again or contact us for help.").response
@@ -307,9 +348,9 @@ class RefundResponseHandler(AbstractRequestHandler):
         return ask_utils.is_intent_name("RefundProductIntent")(handler_input)
 
     def handle(self, handler_input):
-        logger.info("in RefundResponseHandler") 
+        logger.debug("in RefundResponseHandler") 
         response_builder = handler_input.response_builder
-        isp_response = get_isp_products(handler_input)
+        products = get_isp_products(handler_input)
         include_display(handler_input)
                         
         return response_builder.add_directive(
@@ -317,7 +358,7 @@ class RefundResponseHandler(AbstractRequestHandler):
                     name="Cancel",
                     payload={
                         "InSkillProduct": {
-                            "productId": isp_response.in_skill_products[0].product_id
+                            "productId": products[0]['productId']
                         }
                     },
                             token="correlationToken")
@@ -331,8 +372,11 @@ class RefundCancelResponseHandler(AbstractRequestHandler):
                 handler_input.request_envelope.request.name == "Cancel")
 
     def handle(self, handler_input):
-        logger.info("in RefundCancelResponseHandler") 
+        logger.debug("in RefundCancelResponseHandler") 
         # type: (HandlerInput) -> Response
+        #whatever the outcome, the cached entitlement summary may be stale now
+        entitlement_cache.invalidate(handler_input.request_envelope.context.system.user.user_id)
+        handler_input.attributes_manager.session_attributes.pop("products", None)
         speech = None
         include_display(handler_input)
         return handler_input.response_builder.speak(speech).response
@@ -345,15 +389,8 @@ class HelpIntentHandler(AbstractRequestHandler):
 
     def handle(self, handler_input):
         # type: (HandlerInput) -> Response
-        logger.info("in HelpIntentHandler") 
-        speak_output = "Hello, explorer! It's good to see you! To play this game, start by saying, visit <lang xml:lang=\"ja-JP\">Tokyo</lang> or visit <lang xml:lang=\"ja-JP\">Kyoto</lang>. If you're stuck on a hard level, say speak to the guide. Don't forget that your wealth or energy either increase or decrease based on the choices you make while on your journey. When you run out of either, the game ends. " 
-
-        return (
-            handler_input.response_builder
-                .speak(speak_output)
-                .ask(speak_output)
-                .response
-        )
+        logger.debug("in HelpIntentHandler") 
+        return HELP_RESPONSE.response()
 
 class CancelOrStopIntentHandler(AbstractRequestHandler):
     """Single handler for Cancel and Stop Intent."""
@@ -364,14 +401,8 @@ class CancelOrStopIntentHandler(AbstractRequestHandler):
 
     def handle(self, handler_input):
         # type: (HandlerInput) -> Response
-        logger.info("in CancelOrStopIntentHandler") 
-        speak_output = "Goodbye!" + getRandomFact() + ". New journeys to Sapporo, Nagasaki, and Okinawa coming soon!"
-
-        return (
-            handler_input.response_builder
-                .speak(speak_output)
-                .response
-        )
+        logger.debug("in CancelOrStopIntentHandler") 
+        return GOODBYE_RESPONSE.response(getRandomFact())
 
 class FallbackIntentHandler(AbstractRequestHandler):
     
@@ -380,15 +411,8 @@ class FallbackIntentHandler(AbstractRequestHandler):
 
     def handle(self, handler_input):
         # type: (HandlerInput) -> Response
-        logger.info("in FallbackIntentHandler") 
-        speech = (
-                "Sorry. I cannot help with that. I can help you "
-                "continue on your journey by saying explore <lang xml:lang=\"ja-JP\">Tokyo</lang> or vist <lang xml:lang=\"ja-JP\">Kyoto</lang>. "
-            )
-        reprompt = "I didn't catch that. What can I help you with?"
-
-        return handler_input.response_builder.speak(speech).ask(
-            reprompt).response
+        logger.debug("in FallbackIntentHandler") 
+        return FALLBACK_RESPONSE.response()
 
 class SessionEndedRequestHandler(AbstractRequestHandler):
     """Handler for Session End."""
@@ -398,15 +422,9 @@ class SessionEndedRequestHandler(AbstractRequestHandler):
 
     def handle(self, handler_input):
         # type: (HandlerInput) -> Response
-        logger.info("in SessionEndedRequestHandler") 
+        logger.debug("in SessionEndedRequestHandler") 
         updateStats(handler_input)
-        speak_output = "Goodbye!" + getRandomFact() + ". New journeys to Sapporo, Nagasaki, and Okinawa coming soon!"
-
-        return (
-            handler_input.response_builder
-                .speak(speak_output)
-                .response
-        )
+        return GOODBYE_RESPONSE.response(getRandomFact())
 
 class CatchAllExceptionHandler(AbstractExceptionHandler):
     """Generic error handling to capture any syntax or routing errors."""
@@ -416,10 +434,14 @@ class CatchAllExceptionHandler(AbstractExceptionHandler):
 
     def handle(self, handler_input, exception):
         # type: (HandlerInput, Exception) -> Response
-        logger.error(exception, exc_info=True)
-        logger(handler_input)
+        data_access.end_request()
+        flush_session_state(handler_input)
+        emit_invocation_metrics(handler_input)
+        logger.error("Unhandled exception: %s", exception, exc_info=True)
+        skill_logging.log_payload(logger, "Request envelope", handler_input.request_envelope)
+        skill_logging.end_request()
 
-        speak_output = "Sorry, I had trouble doing what you asked. Please try again."
+        speak_output = ERROR_MESSAGE
 
         return (
             handler_input.response_builder
@@ -428,165 +450,209 @@ class CatchAllExceptionHandler(AbstractExceptionHandler):
                 .response
         )
 
+class RequestMemoRequestInterceptor(AbstractRequestInterceptor):
+    """Opens a per-request read-through memo so the same DynamoDB key is only read once per turn."""
+    def process(self, handler_input):
+        # type: (HandlerInput) -> None
+        handler_input.attributes_manager.request_attributes["memo"] = data_access.begin_request()
+
+class RequestMemoResponseInterceptor(AbstractResponseInterceptor):
+    """Drops the per-request memo and logs how many reads it saved."""
+    def process(self, handler_input, response):
+        # type: (HandlerInput, Response) -> None
+        memo = data_access.end_request()
+        if memo is not None:
+            logger.debug("Request memo: %s reads issued, %s deduplicated", memo.misses, memo.hits)
+
+class SpeechGuardResponseInterceptor(AbstractResponseInterceptor):
+    """Swaps speech Alexa would reject (too long, malformed) for plain text so the turn still plays."""
+    def process(self, handler_input, response):
+        # type: (HandlerInput, Response) -> None
+        if response is None:
+            return
+        response.output_speech = ssml.safe_output_speech(response.output_speech)
+        if response.reprompt is not None:
+            response.reprompt.output_speech = ssml.safe_output_speech(response.reprompt.output_speech)
+
+class SessionStateResponseInterceptor(AbstractResponseInterceptor):
+    """Writes the session state objects used by the handler back into the session attributes."""
+    def process(self, handler_input, response):
+        # type: (HandlerInput, Response) -> None
+        flush_session_state(handler_input)
+
 class LoggingResponseInterceptor(AbstractResponseInterceptor):
     """Invoked immediately after execution of the request handler for an incoming request. 
     Used to print response for logging purposes
     """
     def process(self, handler_input, response):
          # type: (HandlerInput, Response) -> None
-        logger.debug("Response logged by LoggingResponseInterceptor: {}".format(response))
+        skill_logging.log_payload(logger, "Response logged by LoggingResponseInterceptor", response)
+        logger.debug("Story cache stats: %s", skill_logging.Lazy(story_cache.stats))
+        emit_invocation_metrics(handler_input)
+        skill_logging.end_request()
 
 class LoggingRequestInterceptor(AbstractRequestInterceptor):
     """Invoked immediately before execution of the request handler for an incoming request. 
     Used to print request for logging purposes
     """
     def process(self, handler_input):
-        logger.debug("Request received by LoggingRequestInterceptor: {}".format(handler_input.request_envelope))
+        metrics.begin_invocation()
+        skill_logging.begin_request(handler_input.request_envelope.request.request_id, get_intent_label(handler_input))
+        skill_logging.log_payload(logger, "Request received by LoggingRequestInterceptor", handler_input.request_envelope)
 
 #---------------general utility functions---------------------
+def get_intent_label(handler_input):
+    #metric dimension: the intent name for intent requests, otherwise the request type
+    request = handler_input.request_envelope.request
+    if request.object_type == "IntentRequest":
+        return request.intent.name
+    if request.object_type == "Connections.Response":
+        return "Connections.Response." + request.name
+    return request.object_type
+
+def emit_invocation_metrics(handler_input):
+    #one EMF line per invocation; CloudWatch turns it into per-intent metrics
+    invocation = metrics.end_invocation()
+    if invocation is None:
+        return
+    session = handler_input.request_envelope.session
+    #the session id is a property, not a dimension: Logs Insights can sum capacity per session from it
+    metrics.emit(metrics.emf_record(get_intent_label(handler_input), invocation,
+                                    session_id=session.session_id if session is not None else None))
+
 #get random fact on SessionEnd, Cancel, or Stop
 def getRandomFact():
-    logger.info("in getRandomFact") 
-    record_number = randint(1,5)
-    table = boto3.resource('dynamodb').Table('JPExpFunFacts')
-    fact_record = table.query(KeyConditionExpression=Key('RecordNumber').eq(str(record_number))) # dynamo is case-sensitive
-
-    if fact_record['Count'] == 1:
-        return fact_record['Items'][0]['Text']
-    else:
-        logger.error("Cannot find fun fact record") 
-        return "Nagasaki is known for its delicious Japanese sake."
+    logger.debug("in getRandomFact") 
+    #sampled from the in-memory pool; no DynamoDB read on the goodbye path once the container is warm
+    return fun_fact_pool.sample()
 
 def getYesorNoResponse(handler_input, textType):
-    logger.info("in getYesorNotResponse") 
-    #retrieve the questions details
-    table = boto3.resource('dynamodb').Table('JPExpStoryDetails')
+    logger.debug("in getYesorNotResponse") 
     speak_output = GAME_END
 
     try: 
-        #retrieve the Yes or No response for the question
-        question_record = table.query(KeyConditionExpression=Key('CityId').eq(get_city_id(handler_input.attributes_manager.session_attributes["city"])) &
-        Key('QuestionNumber').eq(handler_input.attributes_manager.session_attributes["stats_record"]['Items'][0]['QuestionNumber']+1)) 
+        stats = session_journey(handler_input)
+
+        #retrieve the Yes or No response for the question together with the question that follows it,
+        #so the get_next_question call below is served from the story cache
+        question_detail = story_cache.resolve_turn(
+            get_city_id(handler_input.attributes_manager.session_attributes["city"]),
+            stats.question_number+1,
+            prefetch=STORY_PREFETCH_QUESTIONS)[0]
 
         #record found
-        if question_record['Count'] == 1: 
+        if question_detail is not None: 
             #speak the Yes or No details
-            speak_output = question_record['Items'][0][textType]
-            speak_output = "<voice name=\""+ get_polly_voice(handler_input.attributes_manager.session_attributes["city"]) + "\">" +  "<lang xml:lang=\"ja-JP\">了解です</lang>" + " </voice>" + speak_output
-
-            #increase current turns by 1 in session
-            handler_input.attributes_manager.session_attributes["stats_record"]['Items'][0]['CurrentTurns'] += 1 
-            
-            #increase completed question number in session
-            handler_input.attributes_manager.session_attributes["stats_record"]['Items'][0]['QuestionNumber'] += 1
-
-            #actually add to or delete from energy/wealth levels in session
-            if textType == 'YesResponseText':
-                handler_input.attributes_manager.session_attributes["stats_record"]['Items'][0]['MoneyLevel'] += question_record['Items'][0]['YesWealthImpact']
-                handler_input.attributes_manager.session_attributes["stats_record"]['Items'][0]['EnergyLevel'] += question_record['Items'][0]['YesEnergyImpact']
-            elif textType == 'NoResponseText':
-                handler_input.attributes_manager.session_attributes["stats_record"]['Items'][0]['MoneyLevel'] += question_record['Items'][0]['NoWealthImpact']
-                handler_input.attributes_manager.session_attributes["stats_record"]['Items'][0]['EnergyLevel'] += question_record['Items'][0]['NoEnergyImpact']   
-
-            #determine if the game needs to end; ends if player runs out of health or wealth
-            current_wealth = handler_input.attributes_manager.session_attributes["stats_record"]['Items'][0]['MoneyLevel']
-            current_energy = handler_input.attributes_manager.session_attributes["stats_record"]['Items'][0]['EnergyLevel']
-
-            #you are out of wealth or health -- the game is over
-            if is_game_over(handler_input.attributes_manager.session_attributes["stats_record"]):
-                speak_output = "<voice name=\""+ get_polly_voice(handler_input.attributes_manager.session_attributes["city"]) + "\">" + "<lang xml:lang=\"ja-JP\">残念ですね</lang>" + "</voice>" + "Oh no explorer, you don't have enough wealth or energy to continue on your journey! This means your journey is over." 
+            fragments = get_voice_fragments(handler_input.attributes_manager.session_attributes["city"])
+            speak_output = ssml.compose(fragments.acknowledge, " ", question_detail[textType])
+
+            #apply the answer's wealth/energy impact and advance the turn and question counters
+            turn = game_engine.play_turn(
+                game_engine.Levels(stats.question_number, stats.current_turns, stats.money_level, stats.energy_level),
+                question_detail, game_engine.answer_for_text(textType), active=stats.active_flag != 'N')
+            stats.question_number, stats.current_turns, stats.money_level, stats.energy_level = turn.levels
+
+            #you are out of wealth or health, or the journey already ended -- the game is over
+            if turn.outcome == game_engine.GAME_OVER:
+                speak_output = ssml.compose(fragments.game_over, GAME_OVER_MESSAGE)
                 #update Game Stats to end the game by setting flag to N
-                set_game_flag('N', handler_input)
+                updateStats(handler_input, end_journey=True)
             #if they are low on wealth/health -- they need a warning
-            elif is_warning_needed(current_wealth,current_energy):
-                speak_output = "<voice name=\"" + get_polly_voice(handler_input.attributes_manager.session_attributes["city"]) + "\">" + "<lang xml:lang=\"ja-JP\">気をつけてください</lang>" + "</voice>" + "Be careful explorer, you are running low on wealth or energy. If you need a travel tip, say speak to the guide."
-                speak_output = speak_output + " " + get_next_question(handler_input.attributes_manager.session_attributes["city"], handler_input.attributes_manager.session_attributes["stats_record"],handler_input)
+            elif turn.outcome == game_engine.WARNING:
+                speak_output = ssml.compose(fragments.careful, LOW_LEVELS_WARNING, " ",
+                                            get_next_question(handler_input.attributes_manager.session_attributes["city"], stats, handler_input))
             else: 
-                speak_output = speak_output + " " + get_next_question(handler_input.attributes_manager.session_attributes["city"], handler_input.attributes_manager.session_attributes["stats_record"],handler_input)   
+                speak_output = ssml.compose(speak_output, " ", get_next_question(handler_input.attributes_manager.session_attributes["city"], stats, handler_input))
         else: #record not found
-            logger.error("That question number doesn't exist: {}".format(handler_input.attributes_manager.session_attributes["stats_record"]['Items'][0]['QuestionNumber'])) 
-            # raise AskSdkException("That question number doesn't exist: {}".format(handler_input.attributes_manager.session_attributes["stats_record"]['Items'][0]['QuestionNumber'])) 
+            logger.error("That question number doesn't exist: %s", stats.question_number) 
+            # raise AskSdkException("That question number doesn't exist: {}".format(stats.question_number)) 
     except:
-        logger.error("An error in getYesorNoResponse for text type {} -- {}".format(textType,handler_input)) 
+        logger.error("An error in getYesorNoResponse for text type %s", textType, exc_info=True) 
         speak_output = "Sorry, explorer! I don't understand what you want to do. {}".format(VISIT_CITY_REPROMPT)
 
     return speak_output 
 
-def updateStats(handler_input):
-    logger.info("in update_stats") 
-    if is_user_on_session(handler_input) and has_active_journey(handler_input):
-        table = boto3.resource('dynamodb').Table('JPExpGameStats')
-        table.update_item(
-            Key={
-                'PlayerNumber': handler_input.attributes_manager.session_attributes["user"]['Items'][0]['PlayerNumber'],
-                'CityId' : get_city_id(handler_input.attributes_manager.session_attributes["city"])
-            },
-            UpdateExpression="set EnergyLevel = :e, MoneyLevel=:m, QuestionNumber=:q, CurrentTurns=:c",
-            ConditionExpression="ActiveFlag=:a",
-            ExpressionAttributeValues={
-                ':e': handler_input.attributes_manager.session_attributes["stats_record"]['Items'][0]['EnergyLevel'],
-                ':m': handler_input.attributes_manager.session_attributes["stats_record"]['Items'][0]['MoneyLevel'],
-                ':q': handler_input.attributes_manager.session_attributes["stats_record"]['Items'][0]['QuestionNumber'],
-                ':c': handler_input.attributes_manager.session_attributes["stats_record"]['Items'][0]['CurrentTurns'],
-                ':a': 'Y'
-            },
-            ReturnValues="UPDATED_NEW"
-        )
+def updateStats(handler_input, end_journey=False):
+    logger.debug("in update_stats") 
+    #all of the session's pending changes go out as one write; the ActiveFlag condition replaces
+    #the has_active_journey round trip we used to make first
+    if not is_user_on_session(handler_input) or "user" not in handler_input.attributes_manager.session_attributes:
+        return False
 
-        #update max turns 
-        maxTurns = handler_input.attributes_manager.session_attributes["user"]['Items'][0]['MaxTurns']
-        currentTurns = handler_input.attributes_manager.session_attributes["stats_record"]['Items'][0]['CurrentTurns']
-
-        if currentTurns > maxTurns:
-            table = boto3.resource('dynamodb').Table('JPExpUsers')
-            table.update_item(
-                Key = {
-                    'UserId': handler_input.attributes_manager.session_attributes["user"]['Items'][0]['UserId'],
-                    'PlayerNumber': handler_input.attributes_manager.session_attributes["user"]['Items'][0]['PlayerNumber'],
-                },
-                UpdateExpression="set MaxTurns = :m",
-                ExpressionAttributeValues={
-                    ':m': currentTurns
-                }
-            )
+    user = session_user(handler_input)
+    stats = session_journey(handler_input)
+
+    #only the progress this session changed is written; the condition still keeps an ended journey ended
+    changes = stats.changes()
+    if end_journey:
+        changes['ActiveFlag'] = 'N'
+    table_name, key = player_store.journey_location(
+        user.user_id, user.player_number, get_city_id(handler_input.attributes_manager.session_attributes["city"]))
+    journey_update = persistence.update_for(
+        table_name, key, changes, condition="ActiveFlag=:a", condition_values={':a': 'Y'})
+    items = [journey_update] if journey_update is not None else []
+
+    #update max turns and the active journey pointer in the same transaction
+    user_changes = {}
+    if stats.current_turns > user.max_turns:
+        user_changes['MaxTurns'] = stats.current_turns
+    if end_journey:
+        user_changes['ActiveCityId'] = NO_ACTIVE_JOURNEY
+    if user_changes:
+        items.append(user_update(user, user_changes))
+
+    if not items:
+        logger.debug("in update_stats - nothing changed, nothing saved")
+        return True
+    if not data_access.write_transaction(items):
+        logger.debug("in update_stats - journey is no longer active, nothing saved")
+        return False
 
-def get_user(user_id):
-    logger.info("in get_user") 
+    user.max_turns = user_changes.get('MaxTurns', user.max_turns)
+    user.active_city_id = user_changes.get('ActiveCityId', user.active_city_id)
+    if end_journey:
+        stats.active_flag = 'N'
+    stats.mark_saved()
+    return True
 
-    table = boto3.resource('dynamodb').Table('JPExpUsers')
-    user = table.query(KeyConditionExpression=Key('UserId').eq(user_id)) # dynamo is case-sensitive
-    return user  
+def user_update(user, changes):
+    #transaction item that sets the given attributes on the user's profile record
+    table_name, key = player_store.user_location(user.user_id, user.player_number)
+    return persistence.update_for(table_name, key, changes)
+
+def get_user(user_id):
+    logger.debug("in get_user") 
+    #with the single-table layout this one read also brings in all of the user's journeys
+    return player_store.get_user(user_id)
 
 def is_returning_user(handler_input):
-    logger.info("in is_returning_user") 
+    logger.debug("in is_returning_user") 
     user_record = get_user(handler_input.request_envelope.context.system.user.user_id)
-    if user_record['Count'] == 1:
+    if user_record is not None:
         #add user to session
-        handler_input.attributes_manager.session_attributes["user"] = user_record
+        set_session_user(handler_input, UserState.from_item(user_record))
         return True
     else:
         return False
   
-def add_new_user(system):
-    logger.info("in add_new_user") 
-    table = boto3.resource('dynamodb').Table('JPExpUsers')
+def add_new_user(system, name=None, country=None):
+    logger.debug("in add_new_user") 
     date = str(dt.datetime.today().strftime("%Y-%m-%d"))
     
-    table.put_item(
-        Item={
-            "Name": "TBD-USERAPI",
-            "PlayerNumber": randint(1, 1000000000),
-            "DeviceId": system.device.device_id,
-            "Date": date,
-            "UserId": system.user.user_id,
-            "Country": "TBD-ADDRESSAPI",
-            "Email": "TBD-CUSTINFOAPI",
-            "MaxTurns": 0
-        }
-    )  # dynamo is case-sensitive
+    data_access.write_transaction([player_store.user_put({
+        "Name": name or "TBD-USERAPI",
+        "PlayerNumber": randint(1, 1000000000),
+        "DeviceId": system.device.device_id,
+        "Date": date,
+        "UserId": system.user.user_id,
+        "Country": country or "TBD-ADDRESSAPI",
+        "Email": "TBD-CUSTINFOAPI",
+        "MaxTurns": 0,
+        "ActiveCityId": NO_ACTIVE_JOURNEY
+    })])  # dynamo is case-sensitive
 
 def is_user_on_session(handler_input):
-    logger.info("in is_user_on_session") 
+    logger.debug("in is_user_on_session") 
     if 'city' in handler_input.attributes_manager.session_attributes:
         if 'stats_record' in handler_input.attributes_manager.session_attributes:
             return True
@@ -597,162 +663,157 @@ def is_user_on_session(handler_input):
 
 def has_active_journey(handler_input):
     
-    logger.info("in has_active_journey") 
+    logger.debug("in has_active_journey") 
 
     #get user from session
-    user = handler_input.attributes_manager.session_attributes["user"]
-    
-    #determine if on an active journey
-    table = boto3.resource('dynamodb').Table('JPExpGameStats')
-    stats_record = table.query(KeyConditionExpression=Key('PlayerNumber').eq(user['Items'][0]['PlayerNumber'])) 
-
-    if stats_record['Count'] == 1:
-        if stats_record['Items'][0]['ActiveFlag'] == 'Y':
-            if 'city' not in handler_input.attributes_manager.session_attributes:
-                handler_input.attributes_manager.session_attributes["city"] = get_city_name(stats_record['Items'][0]['CityId'])
-                
-            if 'stats_record' not in handler_input.attributes_manager.session_attributes:
-                handler_input.attributes_manager.session_attributes["stats_record"] = stats_record
-            return True
-        else:
-            return False
-    elif stats_record['Count'] > 1: #user has multiple journeys
-        #find the active journey
-        for x in range(0,stats_record['Count']):
-            item = stats_record['Items'][x]
-            if item['ActiveFlag'] == 'Y':
-                if 'city' not in handler_input.attributes_manager.session_attributes:
-                    handler_input.attributes_manager.session_attributes["city"] =  get_city_name(item['CityId'])
-                
-                if 'stats_record' not in handler_input.attributes_manager.session_attributes:
-                    new_item = {'Items':[item]}
-                    handler_input.attributes_manager.session_attributes["stats_record"] = new_item
-                return True
-        #if no active journey, return false
+    user = session_user(handler_input)
+    active_city_id = user.active_city_id
+
+    #players from before the pointer existed: find their active journey the old way, once
+    if active_city_id is None:
+        return find_active_journey(handler_input)
+
+    if active_city_id == NO_ACTIVE_JOURNEY:
         return False
-    else:
+
+    #determine if on an active journey with a single key read, however many journeys the player has
+    #(no read at all with the single-table layout: the journeys came with the profile)
+    item = player_store.get_journey(user.user_id, user.player_number, active_city_id)
+    if item is None or item['ActiveFlag'] != 'Y':
+        logger.debug("in has_active_journey - clearing stale active journey pointer") 
+        set_active_journey(user, NO_ACTIVE_JOURNEY)
         return False
 
+    put_journey_on_session(handler_input, item)
+    return True
+
+def find_active_journey(handler_input):
+    logger.debug("in find_active_journey") 
+    user = session_user(handler_input)
+
+    #read every journey of the player and look for the active one
+    for item in player_store.get_journeys(user.user_id, user.player_number):
+        if item['ActiveFlag'] == 'Y':
+            set_active_journey(user, item['CityId'])
+            put_journey_on_session(handler_input, item)
+            return True
+
+    #if no active journey, return false
+    set_active_journey(user, NO_ACTIVE_JOURNEY)
+    return False
+
+def put_journey_on_session(handler_input, item):
+    if 'city' not in handler_input.attributes_manager.session_attributes:
+        handler_input.attributes_manager.session_attributes["city"] = get_city_name(item['CityId'])
+        
+    if 'stats_record' not in handler_input.attributes_manager.session_attributes:
+        set_session_journey(handler_input, JourneyState.from_item(item))
+
+def set_active_journey(user, city_id):
+    #keep the active journey pointer on the user's profile record (and the session copy) up to date
+    data_access.write_transaction([user_update(user, {'ActiveCityId': city_id})])
+    user.active_city_id = city_id
+
 def get_city_name(CityId):
-    logger.info("in get_city_name - CityId: {}".format(CityId)) 
-    table = boto3.resource('dynamodb').Table('JPExpCities')
-    city_record = table.query(KeyConditionExpression=Key('CityId').eq(CityId)) # dynamo is case-sensitive
+    logger.debug("in get_city_name - CityId: %s", CityId) 
+    city = city_registry.by_id(CityId)
 
-    if city_record['Count'] == 1:
-        return city_record['Items'][0]['CityName']
+    if city is not None:
+        return city.name
     else:
-        logger.error("Cannot find city name for given id {}".format(CityId)) 
+        logger.error("Cannot find city name for given id %s", CityId) 
         raise AskSdkException("Cannot find city name for given id {}".format(CityId)) 
 
 def get_city_id(CityName):
-    logger.info("in get_city_id") 
-    table = boto3.resource('dynamodb').Table('JPExpCities')
-    city_record = table.query(
-        IndexName='CityName-index',
-        KeyConditionExpression=Key('CityName').eq(CityName)) # dynamo is case-sensitive
+    logger.debug("in get_city_id") 
+    city = city_registry.by_name(CityName)
     
-    if city_record['Count'] == 1:
-        return city_record['Items'][0]['CityId']
+    if city is not None:
+        return city.city_id
     else:
-        logger.error("Cannot find city id for given name {}".format(CityName)) 
+        logger.error("Cannot find city id for given name %s", CityName) 
         raise AskSdkException("Cannot find city id for given name {}".format(CityName)) 
 
-def continue_journey(handler_input):
-    logger.info("in continue_journey") 
-    speak_output = "<voice name=\""+ get_polly_voice(handler_input.attributes_manager.session_attributes["city"]) + "\">" + "<lang xml:lang=\"ja-JP\">ようこそ</lang>" + "</voice>" + " Welcome back explorer! It's good to see you! " 
+def get_slot_city(handler_input):
+    slots = handler_input.request_envelope.request.intent.slots or {}
+    if 'city' in slots:
+        return slots['city'].value
+    return None
 
-    speak_output = speak_output + get_next_question(handler_input.attributes_manager.session_attributes["city"], handler_input.attributes_manager.session_attributes["stats_record"],handler_input)  
+def prefetch_story(cityname):
+    #warm the story cache for a city so the first question is a memory hit
+    city = city_registry.by_name(cityname)
+    if city is not None:
+        story_cache.get(city.city_id)
 
-    return speak_output
+def continue_journey(handler_input):
+    logger.debug("in continue_journey") 
+    return ssml.compose(get_voice_fragments(handler_input.attributes_manager.session_attributes["city"]).welcome, " Welcome back explorer! It's good to see you! ",
+                        get_next_question(handler_input.attributes_manager.session_attributes["city"], session_journey(handler_input), handler_input))
     
 def get_next_question(cityname, stats, handler_input):
-    logger.info(" in get_next_question City Name: {}".format(cityname))
-    logger.info(" in get_next_question Stats Completed Question Number: {}".format(stats['Items'][0]['QuestionNumber']+1))
+    logger.debug(" in get_next_question City Name: %s", cityname)
+    logger.debug(" in get_next_question Stats Completed Question Number: %s", stats.question_number+1)
     #return next question
-    table = boto3.resource('dynamodb').Table('JPExpStories')
     speak_output = GAME_END
     
-    #retrieve the next question for the particular city
-    question_record = table.query(KeyConditionExpression=Key('CityId').eq(get_city_id(cityname)) &
-    Key('QuestionNumber').eq(stats['Items'][0]['QuestionNumber']+1)) #current completed question + 1
+    #retrieve the next question for the particular city from the cached city story
+    question = story_cache.get_question(get_city_id(cityname), stats.question_number+1) #current completed question + 1
 
     #record found
-    if question_record['Count'] == 1: 
-        speak_output = question_record['Items'][0]['QuestionText']    
+    if question is not None: 
+        speak_output = question['QuestionText']    
     else: #record not found
-        logger.error("That question number doesn't exist: {}".format(stats['Items'][0]['QuestionNumber']+1)) 
-        updateStats(handler_input) #current values
-        set_game_flag('N', handler_input) #flag game as over
-        stats['Items'][0]['ActiveFlag'] = 'N' #update value on session
-        #raise AskSdkException("That question number doesn't exist: {}".format(stats['Items'][0]['QuestionNumber']+1)) 
+        logger.error("That question number doesn't exist: %s", stats.question_number+1) 
+        updateStats(handler_input, end_journey=True) #current values, flag game as over
+        stats.active_flag = 'N' #update value on session
+        #raise AskSdkException("That question number doesn't exist: {}".format(stats.question_number+1)) 
 
     return speak_output
 
 #get correct Polly voice based on selected city
-def get_polly_voice(city):
-    logger.info("in get_polly_voice") 
-    if city == 'Tokyo':
-       return "Takumi"
-    elif city == 'Kyoto':
-       return "Mizuki"
-
-def set_game_flag(value, handler_input):
-    logger.info("in set_game_flag") 
-    if is_user_on_session(handler_input) and has_active_journey(handler_input):
-        table = boto3.resource('dynamodb').Table('JPExpGameStats')
-        table.update_item(
-            Key={
-                'PlayerNumber': handler_input.attributes_manager.session_attributes["user"]['Items'][0]['PlayerNumber'],
-                'CityId' : get_city_id(handler_input.attributes_manager.session_attributes["city"])
-            },
-            UpdateExpression="set ActiveFlag=:n",
-            ConditionExpression="ActiveFlag=:a",
-            ExpressionAttributeValues={
-                ':n': 'N',
-                ':a': 'Y'
-            }
-        )
+def get_voice_fragments(city):
+    logger.debug("in get_voice_fragments") 
+    city_record = city_registry.by_name(city)
+    if city_record is not None:
+        return city_record.fragments
+    return ssml.fragments_for(DEFAULT_VOICE)
 
 def start_new_journey(handler_input):
     #create initial game stat record
-    logger.info("in start_new_journey") 
-    table = boto3.resource('dynamodb').Table('JPExpGameStats')
+    logger.debug("in start_new_journey") 
     date = str(dt.datetime.today().strftime("%Y-%m-%d"))
 
     #add selected city to session
     handler_input.attributes_manager.session_attributes["city"] = handler_input.request_envelope.request.intent.slots['city'].value
 
+    levels = game_engine.starting_levels()
     new_journey = {
-        "PlayerNumber": handler_input.attributes_manager.session_attributes["user"]['Items'][0]['PlayerNumber'],
-        "QuestionNumber": 0,
+        "PlayerNumber": session_user(handler_input).player_number,
+        "QuestionNumber": levels.question_number,
         "CityId": get_city_id(handler_input.request_envelope.request.intent.slots['city'].value),
-        "CurrentTurns": 0,
-        "MoneyLevel": 50,
-        "EnergyLevel": 50,
+        "CurrentTurns": levels.current_turns,
+        "MoneyLevel": levels.money_level,
+        "EnergyLevel": levels.energy_level,
         "ActiveFlag" : 'Y',
         "Date": date
     }
 
-    table.put_item(
-            Item=new_journey
-        )  # dynamo is case-sensitive
+    #the journey and the user's pointer to it are written together
+    user = session_user(handler_input)
+    data_access.write_transaction([
+        player_store.journey_put(user.user_id, new_journey),  # dynamo is case-sensitive
+        user_update(user, {'ActiveCityId': new_journey['CityId']})
+    ])
+    user.active_city_id = new_journey['CityId']
 
     #put the stats on the session
-    handler_input.attributes_manager.session_attributes["stats_record"] = {'Items':[new_journey]}
+    set_session_journey(handler_input, JourneyState.from_item(new_journey))
 
 def is_game_over(stats):
-    logger.info("in is_game_over") 
+    logger.debug("in is_game_over") 
     #game is over if they run out of wealth or energy or there are no questions left
-    if stats['Items'][0]['MoneyLevel'] <= 0 or stats['Items'][0]['EnergyLevel'] <=0 or stats['Items'][0]['ActiveFlag'] == 'N':
-        return True
-    else:
-        return False
-
-def is_warning_needed(current_wealth,current_energy):
-    if current_wealth <= 10 or current_energy <= 10:
-        return True
-    else:
-        return False
+    return game_engine.is_game_over(stats.money_level, stats.energy_level, active=stats.active_flag != 'N')
 
 #add graphical component to the skill
 def supports_display(handler_input):
@@ -773,18 +834,18 @@ def supports_display(handler_input):
 
 #add graphical component to the skill
 def include_display(handler_input):
-    logger.info("in include_display") 
+    logger.debug("in include_display") 
     #APL Directive Code
     if supports_apl(handler_input):
         handler_input.response_builder.add_directive(
             RenderDocumentDirective(
-                document=load_apl_document("main.json"),
-                datasources=load_apl_document("datasources.json")
+                document=APL_DOCUMENT,
+                datasources=APL_DATASOURCES
             )
         )
 
 def supports_apl(handler_input):
-    logger.info("in support_apl") 
+    logger.debug("in support_apl") 
     # type: (HandlerInput) -> bool
     """Check if display is supported by the skill."""
     try:
@@ -800,63 +861,39 @@ def supports_apl(handler_input):
 
 #APL helper functions
 def load_apl_document(file_path):
-    logger.info("in load_apl_document") 
+    logger.debug("in load_apl_document") 
     # type: (str) -> Dict[str, Any]
     """Load the apl json document at the path into a dict object."""
-    with open(file_path) as f:
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), file_path)) as f:
         return json.load(f)
 
+def validate_apl_document(document):
+    # type: (Dict[str, Any]) -> Dict[str, Any]
+    """Fail at import rather than on a device if the APL document is not usable."""
+    if document.get("type") != "APL" or "mainTemplate" not in document:
+        raise ValueError("main.json is not an APL document")
+    return document
+
+#parsed once per container and shared by every request; read-only, since the serializer caches their JSON
+APL_DOCUMENT = deep_freeze(validate_apl_document(load_apl_document("main.json")))
+APL_DATASOURCES = deep_freeze(load_apl_document("datasources.json"))
 
-#Alexa Settings API
+
+#Alexa Settings, Device Address and Customer Profile APIs: pooled, deadline-bound and cached
+#per device/account by alexa_api; each returns None when the value isn't available
 def get_user_timezone(handler_input):
-    base_uri = handler_input.request_envelope.context.system.api_endpoint
-    device_id = handler_input.request_envelope.context.system.device.device_id
-    api_access_token = handler_input.request_envelope.context.system.api_access_token
-    response = requests.get(base_uri + "/v2/devices/" + device_id + "/settings/System.timeZone", 
-                    headers = {
-                        'Accept': 'application/json',
-                        'Authorization': 'Bearer {}'.format(api_access_token)
-                    }
-                )
-    data = json.loads(response.text)
-    return data
+    return alexa_api.timezone(handler_input.request_envelope.context.system)
 
-#Device Address API
 def get_user_country(handler_input):
-    base_uri = handler_input.request_envelope.context.system.api_endpoint
-    device_id = handler_input.request_envelope.context.system.device.device_id
-    api_access_token = handler_input.request_envelope.context.system.api_access_token
-    response = requests.get(base_uri + "/v1/devices/" + device_id + "/settings/address/countryAndPostalCode", 
-                    headers = {
-                        'Accept': 'application/json',
-                        'Authorization': 'Bearer {}'.format(api_access_token)
-                    }
-                )
-    data = json.loads(response.text)
-
-    logger.info("in get_user_country - device address API response: {}".format(data)) 
-    
-    return data["countryCode"]
+    return alexa_api.country(handler_input.request_envelope.context.system)
 
 #Customer Profile API
 #/v2/accounts/~current/settings/Profile.givenName
 #/v2/accounts/~current/settings/Profile.email
 #/v2/accounts/~current/settings/Profile.mobileNumber
 def get_user_name(handler_input):
-    logger.info("in get_user_name") 
-    base_uri = handler_input.request_envelope.context.system.api_endpoint
-    api_access_token = handler_input.request_envelope.context.system.api_access_token
-    response = requests.get(base_uri + "/v2/accounts/~current/settings/Profile.name", 
-                    headers = {
-                        'Accept': 'application/json',
-                        'Authorization': 'Bearer {}'.format(api_access_token)
-                    }
-                )
-    data = json.loads(response.text)
-
-    logger.info("in get_user_name - customer profile API response: {}".format(data)) 
-
-    return data
+    logger.debug("in get_user_name") 
+    return alexa_api.name(handler_input.request_envelope.context.system)
 
 #Location Services
 #If the device doesn't support location services, nothing is returned
@@ -871,7 +908,7 @@ def get_user_location(handler_input):
         return "unsupported on this device"
 
 def include_display_template(handler_input):
-    logger.info("in include_display_template") 
+    logger.debug("in include_display_template") 
     
     #Display Template Code
     if supports_display(handler_input):
@@ -892,7 +929,7 @@ def include_display_template(handler_input):
 
 #add graphical card to the skill
 def include_card(response_builder):
-    logger.info("in include_card") 
+    logger.debug("in include_card") 
 
     #Card Code
     response_builder.set_card(
@@ -909,20 +946,24 @@ def include_card(response_builder):
 #ISP helper functions
 def get_isp_products(handler_input):
 
-    logger.info("in get_isp_products") 
+    logger.debug("in get_isp_products") 
+    user_id = handler_input.request_envelope.context.system.user.user_id
     locale = handler_input.request_envelope.request.locale
-    mservice = handler_input.service_client_factory.get_monetization_service()
-    response = mservice.get_in_skill_products(locale)
+    products = entitlement_cache.get(user_id, locale)
+
+    if products is None:
+        mservice = handler_input.service_client_factory.get_monetization_service()
+        products = summarize_products(metrics.timed_call(
+            'Monetization', 'GetInSkillProducts', locale, mservice.get_in_skill_products, locale))
+        entitlement_cache.put(user_id, locale, products)
     
-    #add products to session
-    handler_input.attributes_manager.session_attributes["products"] = response
-    return response
-
-def is_user_entitled(response):
-    logger.info("in is_user_entitled") 
-    entitled_product_list = [
-        l for l in response.in_skill_products if (
-                l.entitled == EntitledState.ENTITLED)]
+    #add the compact product summary to session
+    handler_input.attributes_manager.session_attributes["products"] = products
+    return products
+
+def is_user_entitled(products):
+    logger.debug("in is_user_entitled") 
+    entitled_product_list = [p for p in products if p['entitled']]
     
     if entitled_product_list:
         return True
@@ -931,22 +972,19 @@ def is_user_entitled(response):
 
 def get_tip_for_question(cityname, stats, handler_input):
     
-    logger.info("in get_tip_for_question") 
-    table = boto3.resource('dynamodb').Table('JPExpStoryDetails')
+    logger.debug("in get_tip_for_question") 
     speak_output = GAME_END
 
-    #retrieve hint/tip for ISP and store on session
-    question_record = table.query(KeyConditionExpression=Key('CityId').eq(get_city_id(cityname)) &
-    Key('QuestionNumber').eq(stats['Items'][0]['QuestionNumber']+1)) #current completed question + 1
+    #retrieve hint/tip for ISP from the cached city story and store on session
+    question_detail = story_cache.get_detail(get_city_id(cityname), stats.question_number+1) #current completed question + 1
 
-    logger.info("in get_tip_for_question - found quiestions {}".format(question_record['Count'])) 
     #record found
-    if question_record['Count'] == 1: 
-        speak_output = question_record['Items'][0]['Tip']
-        handler_input.attributes_manager.session_attributes['Tip'] = question_record['Items'][0]['Tip']
+    if question_detail is not None: 
+        speak_output = question_detail['Tip']
+        handler_input.attributes_manager.session_attributes['Tip'] = question_detail['Tip']
     else: #record not found
-        logger.error("That question number doesn't exist: {}".format(stats['Items'][0]['QuestionNumber']+1)) 
-        #raise AskSdkException("That question number doesn't exist: {}".format(stats['Items'][0]['QuestionNumber']+1)) 
+        logger.error("That question number doesn't exist: %s", stats.question_number+1) 
+        #raise AskSdkException("That question number doesn't exist: {}".format(stats.question_number+1)) 
 
     return speak_output
 
@@ -954,29 +992,57 @@ def get_tip_for_question(cityname, stats, handler_input):
 # payloads to the handlers above. Make sure any new handlers or interceptors you've
 # defined are included below. The order matters - they're processed top to bottom.
 
+class LazyApiClient(ApiClient):
+    """Defers building DefaultApiClient (and importing requests) until a service call is made."""
+    def __init__(self):
+        self._client = None
+
+    def invoke(self, request):
+        # type: (ApiClientRequest) -> ApiClientResponse
+        if self._client is None:
+            from ask_sdk_core.api_client import DefaultApiClient
+            self._client = DefaultApiClient()
+        return self._client.invoke(request)
+
 # Skill Builder object
-sb = CustomSkillBuilder(api_client=DefaultApiClient())
+sb = CustomSkillBuilder(api_client=LazyApiClient())
 
 # Add all request handlers to the skill.
-sb.add_request_handler(LaunchRequestHandler())
-sb.add_request_handler(StartJapanExplorerIntentHandler())
-sb.add_request_handler(HelpIntentHandler())
-sb.add_request_handler(CancelOrStopIntentHandler())
-sb.add_request_handler(SessionEndedRequestHandler())
-sb.add_request_handler(FallbackIntentHandler())
-sb.add_request_handler(YesIntentHandler())
-sb.add_request_handler(NoIntentHandler())
-sb.add_request_handler(SpeakToGuideIntentHandler())
-sb.add_request_handler(UpsellResponseHandler())
-sb.add_request_handler(RefundResponseHandler())
-sb.add_request_handler(RefundCancelResponseHandler())
+#every request goes through one routing table instead of the dispatcher's can_handle chain;
+#the handlers' can_handle methods describe the same routes for anyone registering them directly
+router = (IntentRouter()
+    .add(LaunchRequestHandler(), "LaunchRequest")
+    .add(StartJapanExplorerIntentHandler(), "IntentRequest", "StartJapanExplorerIntent")
+    .add(HelpIntentHandler(), "IntentRequest", "AMAZON.HelpIntent")
+    .add(CancelOrStopIntentHandler(), "IntentRequest", "AMAZON.CancelIntent", "AMAZON.StopIntent")
+    .add(SessionEndedRequestHandler(), "SessionEndedRequest")
+    .add(FallbackIntentHandler(), "IntentRequest", "AMAZON.FallbackIntent")
+    .add(YesIntentHandler(), "IntentRequest", "AMAZON.YesIntent")
+    .add(NoIntentHandler(), "IntentRequest", "AMAZON.NoIntent")
+    .add(SpeakToGuideIntentHandler(), "IntentRequest", "SpeakToGuideIntent")
+    .add(UpsellResponseHandler(), "Connections.Response", "Upsell")
+    .add(RefundResponseHandler(), "IntentRequest", "RefundProductIntent")
+    .add(RefundCancelResponseHandler(), "Connections.Response", "Cancel"))
+sb.add_request_handler(router)
 
 # Add exception handler to the skill.
 sb.add_exception_handler(CatchAllExceptionHandler())
 
 # Add request and response interceptors
+sb.add_global_response_interceptor(SpeechGuardResponseInterceptor())
+sb.add_global_response_interceptor(SessionStateResponseInterceptor())
 sb.add_global_response_interceptor(LoggingResponseInterceptor())
+sb.add_global_response_interceptor(RequestMemoResponseInterceptor())
 sb.add_global_request_interceptor(LoggingRequestInterceptor())
+sb.add_global_request_interceptor(RequestMemoRequestInterceptor())
+
+#the APL document and the template speech are serialized once, not on every response
+serializer = FrozenSerializer()
+serializer.freeze_tree(APL_DOCUMENT)
+serializer.freeze_tree(APL_DATASOURCES)
+for template in (HELP_RESPONSE, FALLBACK_RESPONSE, GOODBYE_RESPONSE):
+    for part in template.shared_parts():
+        serializer.freeze(part)
 
 # Expose the lambda handler function that can be tagged to AWS Lambda handler
-handler = sb.lambda_handler()
\ No newline at end of file
+handler = lambda_handler(sb, serializer)
\ No newline at end of file
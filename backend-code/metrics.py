@@ -0,0 +1,142 @@
+import contextvars
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+logger = logging.getLogger()
+
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'JapanExplorer')
+#DynamoDB operations whose consumed capacity counts as reads; everything else is a write
+READ_OPERATIONS = frozenset(['GetItem', 'Query', 'Scan', 'BatchGetItem'])
+#set to false to stop writing EMF lines (e.g. local runs that have no CloudWatch agent to read them)
+METRICS_EMF = os.environ.get('METRICS_EMF', 'true').lower() == 'true'
+
+
+class InvocationMetrics(object):
+    """Every backend call (DynamoDB, monetization, Alexa APIs) made while handling one request."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = []
+
+    def add(self, call):
+        with self._lock:
+            self.calls.append(call)
+
+    def totals(self):
+        with self._lock:
+            calls = list(self.calls)
+        dynamodb = [c for c in calls if c['service'] == 'DynamoDB']
+        return {
+            'BackendCalls': len(calls),
+            'DynamoDBCalls': len(dynamodb),
+            'BackendLatency': round(sum(c['ms'] for c in calls), 2),
+            'ReadCapacityUnits': sum(c['capacity'] for c in dynamodb if c['operation'] in READ_OPERATIONS),
+            'WriteCapacityUnits': sum(c['capacity'] for c in dynamodb if c['operation'] not in READ_OPERATIONS),
+            'Retries': sum(c['retries'] for c in calls),
+            'BackendErrors': sum(1 for c in calls if c['error'])
+        }
+
+
+_invocation = contextvars.ContextVar('invocation_metrics', default=None)
+
+
+def begin_invocation():
+    # type: () -> InvocationMetrics
+    metrics = InvocationMetrics()
+    _invocation.set(metrics)
+    return metrics
+
+
+def end_invocation():
+    # type: () -> InvocationMetrics
+    metrics = _invocation.get()
+    _invocation.set(None)
+    return metrics
+
+
+def _capacity(response):
+    consumed = response.get('ConsumedCapacity') if isinstance(response, dict) else None
+    if consumed is None:
+        return 0.0
+    if isinstance(consumed, list):
+        return float(sum(c.get('CapacityUnits', 0) for c in consumed))
+    return float(consumed.get('CapacityUnits', 0))
+
+
+def _retries(response):
+    if not isinstance(response, dict):
+        return 0
+    return response.get('ResponseMetadata', {}).get('RetryAttempts', 0)
+
+
+def timed_call(service, operation, resource, fn, *args, **kwargs):
+    """Run fn(*args, **kwargs) and record it against the current invocation (if any)."""
+    metrics = _invocation.get()
+    if metrics is None:
+        return fn(*args, **kwargs)
+
+    call = {'service': service, 'operation': operation, 'resource': resource,
+            'capacity': 0.0, 'retries': 0, 'error': None}
+    start = time.perf_counter()
+    try:
+        response = fn(*args, **kwargs)
+        call['capacity'] = _capacity(response)
+        call['retries'] = _retries(response)
+        return response
+    except Exception as e:
+        error = getattr(e, 'response', None)
+        call['error'] = error['Error']['Code'] if isinstance(error, dict) and 'Error' in error else type(e).__name__
+        call['retries'] = _retries(error)
+        raise
+    finally:
+        call['ms'] = round((time.perf_counter() - start) * 1000, 2)
+        metrics.add(call)
+
+
+def emf_record(intent, metrics, session_id=None):
+    # type: (str, InvocationMetrics, str) -> str
+    """Render a CloudWatch Embedded Metric Format line with the invocation's per-intent totals."""
+    values = metrics.totals()
+    units = {'BackendLatency': 'Milliseconds'}
+    record = {
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': METRICS_NAMESPACE,
+                'Dimensions': [['Intent']],
+                'Metrics': [{'Name': name, 'Unit': units.get(name, 'Count')} for name in sorted(values)]
+            }]
+        },
+        'Intent': intent,
+        #per-call detail rides along as a plain property for Logs Insights queries
+        'Calls': [dict((k, c[k]) for k in ('service', 'operation', 'resource', 'ms', 'capacity', 'retries', 'error'))
+                  for c in metrics.calls]
+    }
+    if session_id is not None:
+        record['SessionId'] = session_id
+    record.update(values)
+    return json.dumps(record, separators=(',', ':'))
+
+
+def _stdout_sink(line):
+    #the Lambda runtime forwards stdout to CloudWatch Logs, which extracts the EMF metrics
+    sys.stdout.write(line + "\n")
+
+
+_sink = _stdout_sink if METRICS_EMF else None
+
+
+def set_sink(sink):
+    # type: (Callable[[str], None]) -> None
+    """Send EMF lines to sink(line) instead of stdout; None drops them."""
+    global _sink
+    _sink = sink
+
+
+def emit(line):
+    # type: (str) -> None
+    if _sink is not None:
+        _sink(line)
@@ -0,0 +1,45 @@
+def changes(saved, current):
+    # type: (Dict[str, Any], Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]
+    """The attributes of current that differ from saved, and the names of those current no longer has."""
+    changed = dict((name, value) for name, value in current.items() if name not in saved or saved[name] != value)
+    removed = sorted(name for name in saved if name not in current)
+    return changed, removed
+
+
+def update_for(table_name, key, changed, removed=(), condition=None, condition_values=None):
+    # type: (str, Dict[str, Any], Dict[str, Any], List[str], str, Dict[str, Any]) -> Dict[str, Any]
+    """Transaction item (see data_access.write_transaction) that writes only the given changes.
+
+    Returns None when there is nothing to write, so the caller can skip the call altogether.
+    """
+    if not changed and not removed:
+        return None
+    #placeholders for every name, so attribute names never collide with DynamoDB reserved words
+    names = {}
+    values = dict(condition_values or {})
+    sets = []
+    for i, name in enumerate(sorted(changed)):
+        names['#s{}'.format(i)] = name
+        values[':s{}'.format(i)] = changed[name]
+        sets.append('#s{0} = :s{0}'.format(i))
+    removes = []
+    for i, name in enumerate(removed):
+        names['#r{}'.format(i)] = name
+        removes.append('#r{}'.format(i))
+    clauses = []
+    if sets:
+        clauses.append("set " + ", ".join(sets))
+    if removes:
+        clauses.append("remove " + ", ".join(removes))
+
+    request = {
+        'TableName': table_name,
+        'Key': key,
+        'UpdateExpression': " ".join(clauses),
+        'ExpressionAttributeNames': names
+    }
+    if values:
+        request['ExpressionAttributeValues'] = values
+    if condition is not None:
+        request['ConditionExpression'] = condition
+    return {'Update': request}
@@ -0,0 +1,119 @@
+import os
+
+import data_access
+
+#on once tools/migrate_single_table.py has copied JPExpUsers and JPExpGameStats into PLAYER_TABLE
+SINGLE_TABLE = os.environ.get('SINGLE_TABLE', 'false').lower() == 'true'
+PLAYER_TABLE = os.environ.get('PLAYER_TABLE_NAME', 'JPExpPlayers')
+USERS_TABLE = 'JPExpUsers'
+JOURNEYS_TABLE = 'JPExpGameStats'
+
+#every item of a player lives under their UserId: one profile item and one item per city journey
+SORT_KEY = 'SK'
+PROFILE_SORT_KEY = 'PROFILE'
+JOURNEY_PREFIX = 'JOURNEY#'
+
+
+def journey_sort_key(city_id):
+    # type: (str) -> str
+    return JOURNEY_PREFIX + str(city_id)
+
+
+def profile_item(user_item):
+    # type: (Dict[str, Any]) -> Dict[str, Any]
+    """A JPExpUsers item as it is stored in the player table."""
+    item = dict(user_item)
+    item[SORT_KEY] = PROFILE_SORT_KEY
+    return item
+
+
+def journey_item(user_id, stats_item):
+    # type: (str, Dict[str, Any]) -> Dict[str, Any]
+    """A JPExpGameStats item as it is stored in the player table, under its user's partition."""
+    item = dict(stats_item)
+    item['UserId'] = user_id
+    item[SORT_KEY] = journey_sort_key(stats_item['CityId'])
+    return item
+
+
+class Player(object):
+    """A user's profile item (None for a new user) and their journey items by CityId."""
+    __slots__ = ('profile', 'journeys')
+
+    def __init__(self, profile, journeys):
+        self.profile = profile
+        self.journeys = journeys
+
+    @classmethod
+    def from_items(cls, items):
+        profile = None
+        journeys = {}
+        for item in items:
+            sort_key = item[SORT_KEY]
+            if sort_key == PROFILE_SORT_KEY:
+                profile = item
+            elif sort_key.startswith(JOURNEY_PREFIX):
+                journeys[item['CityId']] = item
+        return cls(profile, journeys)
+
+
+def load_player(user_id):
+    # type: (str) -> Player
+    """Read a player's profile and every journey with one Query, memoized within the invocation."""
+    return Player.from_items(data_access.query(PLAYER_TABLE, {'UserId': user_id})['Items'])
+
+
+def get_user(user_id):
+    # type: (str) -> Dict[str, Any]
+    """Return the user's profile item, or None for a new user."""
+    if SINGLE_TABLE:
+        return load_player(user_id).profile
+    response = data_access.query(USERS_TABLE, {'UserId': user_id})  # dynamo is case-sensitive
+    return response['Items'][0] if response['Count'] == 1 else None
+
+
+def get_journey(user_id, player_number, city_id):
+    # type: (str, int, str) -> Dict[str, Any]
+    """Return one journey item (None if there isn't one); with SINGLE_TABLE it is already in memory after get_user."""
+    if SINGLE_TABLE:
+        return load_player(user_id).journeys.get(city_id)
+    return data_access.get_item(JOURNEYS_TABLE, {'PlayerNumber': player_number, 'CityId': city_id})
+
+
+def get_journeys(user_id, player_number):
+    # type: (str, int) -> List[Dict[str, Any]]
+    if SINGLE_TABLE:
+        return list(load_player(user_id).journeys.values())
+    return data_access.query(JOURNEYS_TABLE, {'PlayerNumber': player_number})['Items']
+
+
+def user_location(user_id, player_number):
+    # type: (str, int) -> Tuple[str, Dict[str, Any]]
+    """The table and key of a user's profile item."""
+    if SINGLE_TABLE:
+        return PLAYER_TABLE, {'UserId': user_id, SORT_KEY: PROFILE_SORT_KEY}
+    return USERS_TABLE, {'UserId': user_id, 'PlayerNumber': player_number}
+
+
+def journey_location(user_id, player_number, city_id):
+    # type: (str, int, str) -> Tuple[str, Dict[str, Any]]
+    """The table and key of one of a user's journey items."""
+    if SINGLE_TABLE:
+        return PLAYER_TABLE, {'UserId': user_id, SORT_KEY: journey_sort_key(city_id)}
+    return JOURNEYS_TABLE, {'PlayerNumber': player_number, 'CityId': city_id}
+
+
+def user_put(user_item):
+    # type: (Dict[str, Any]) -> Dict[str, Any]
+    """Transaction item that creates a user's profile."""
+    if SINGLE_TABLE:
+        return {'Put': {'TableName': PLAYER_TABLE, 'Item': profile_item(user_item)}}
+    return {'Put': {'TableName': USERS_TABLE, 'Item': user_item}}
+
+
+def journey_put(user_id, stats_item):
+    # type: (str, Dict[str, Any]) -> Dict[str, Any]
+    """Transaction item that creates (or restarts) one of a user's journeys."""
+    if SINGLE_TABLE:
+        return {'Put': {'TableName': PLAYER_TABLE, 'Item': journey_item(user_id, stats_item)}}
+    return {'Put': {'TableName': JOURNEYS_TABLE, 'Item': stats_item}}
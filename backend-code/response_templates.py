@@ -0,0 +1,133 @@
+import copy
+import json
+
+from ask_sdk_core.serialize import DefaultSerializer
+from ask_sdk_model import Response
+from ask_sdk_model.ui import SsmlOutputSpeech, Reprompt
+
+
+def _ssml(speech):
+    return SsmlOutputSpeech(ssml="<speak>{}</speak>".format(speech))
+
+
+class ResponseTemplate(object):
+    """A response whose speech is built once per container and shared by every request.
+
+    `speech` may contain one `{}` slot for the part that changes per request (a fun fact, say);
+    the text around it is kept as prebuilt halves so a fill is a single concatenation. Each call
+    to response() returns a new Response, so interceptors can replace its parts, but the speech
+    objects inside are shared and must be treated as read-only.
+    """
+    def __init__(self, speech, reprompt=None, should_end_session=None):
+        if "{}" in speech:
+            prefix, suffix = speech.split("{}", 1)
+            self._prefix = "<speak>" + prefix
+            self._suffix = suffix + "</speak>"
+            self.output_speech = None
+        else:
+            self.output_speech = _ssml(speech)
+        self.reprompt_speech = _ssml(reprompt) if reprompt is not None else None
+        #as with ResponseFactory.ask, a reprompt keeps the session open
+        if should_end_session is None and reprompt is not None:
+            should_end_session = False
+        self.should_end_session = should_end_session
+
+    def response(self, fill=None):
+        # type: (str) -> Response
+        output_speech = self.output_speech
+        if output_speech is None:
+            output_speech = SsmlOutputSpeech(ssml=self._prefix + (fill or "") + self._suffix)
+        return Response(
+            output_speech=output_speech,
+            reprompt=Reprompt(output_speech=self.reprompt_speech) if self.reprompt_speech is not None else None,
+            should_end_session=self.should_end_session)
+
+    def shared_parts(self):
+        """The objects every response from this template shares, for FrozenSerializer.freeze."""
+        return [part for part in (self.output_speech, self.reprompt_speech) if part is not None]
+
+
+def _read_only(self, *args, **kwargs):
+    raise TypeError("shared response content is read-only; copy it before changing it")
+
+
+class ReadOnlyDict(dict):
+    """A dict that refuses in-place changes; deep copies of it are plain, mutable dicts."""
+    __setitem__ = __delitem__ = __ior__ = clear = pop = popitem = setdefault = update = _read_only
+
+    def __deepcopy__(self, memo):
+        return dict((key, copy.deepcopy(value, memo)) for key, value in self.items())
+
+
+class ReadOnlyList(list):
+    """A list that refuses in-place changes; deep copies of it are plain, mutable lists."""
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = extend = insert = pop = remove = clear = sort = reverse = _read_only
+
+    def __deepcopy__(self, memo):
+        return [copy.deepcopy(value, memo) for value in self]
+
+
+def deep_freeze(value):
+    # type: (Any) -> Any
+    """Return a read-only copy of a JSON-shaped value, for objects shared by every response."""
+    if isinstance(value, dict):
+        return ReadOnlyDict((key, deep_freeze(child)) for key, child in value.items())
+    if isinstance(value, list):
+        return ReadOnlyList(deep_freeze(child) for child in value)
+    return value
+
+
+class FrozenSerializer(DefaultSerializer):
+    """DefaultSerializer that serializes registered read-only objects once and reuses the result.
+
+    The APL document and the templates' speech are the same objects on every response; walking
+    them again per request is most of the skill's serialization time. The cached forms are shared
+    between responses, so whatever consumes the serialized envelope must not modify it, and the
+    frozen objects themselves must not change: freeze_tree only takes deep_freeze'd values.
+    """
+    def __init__(self):
+        super(FrozenSerializer, self).__init__()
+        self._frozen = {}
+
+    def freeze(self, obj):
+        #keep the object itself alive so its id can't be reused by another object
+        self._frozen[id(obj)] = (obj, super(FrozenSerializer, self).serialize(obj))
+
+    def freeze_tree(self, obj):
+        """Freeze a deep_freeze'd value and every dict and list inside it, innermost first.
+
+        Copies that share some of its subtrees then still reuse their serialized forms.
+        """
+        if isinstance(obj, (dict, list)) and not isinstance(obj, (ReadOnlyDict, ReadOnlyList)):
+            raise TypeError("only deep_freeze'd values can be frozen; a mutable one could be served stale")
+        if isinstance(obj, dict):
+            children = obj.values()
+        elif isinstance(obj, list):
+            children = obj
+        else:
+            return
+        for child in children:
+            self.freeze_tree(child)
+        self.freeze(obj)
+
+    def serialize(self, obj):
+        frozen = self._frozen.get(id(obj))
+        if frozen is not None:
+            return frozen[1]
+        return super(FrozenSerializer, self).serialize(obj)
+
+
+def lambda_handler(skill_builder, serializer):
+    # type: (CustomSkillBuilder, DefaultSerializer) -> Callable[[Dict[str, Any], Any], Dict[str, Any]]
+    """Like skill_builder.lambda_handler(), but the skill is built once and uses the given serializer."""
+    from ask_sdk_core.skill import CustomSkill
+    from ask_sdk_model import RequestEnvelope
+
+    skill = CustomSkill(skill_configuration=skill_builder.skill_configuration)
+    skill.serializer = serializer
+
+    def wrapper(event, context):
+        request_envelope = serializer.deserialize(payload=json.dumps(event), obj_type=RequestEnvelope)
+        return serializer.serialize(skill.invoke(request_envelope=request_envelope, context=context))
+    return wrapper
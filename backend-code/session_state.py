@@ -0,0 +1,173 @@
+import logging
+from decimal import Decimal
+
+import persistence
+
+logger = logging.getLogger()
+
+#bump when the session shape changes; from_session keeps reading older versions
+SESSION_STATE_VERSION = 2
+USER_KEY = "user"
+JOURNEY_KEY = "stats_record"
+_REQUEST_KEY = "session_state"
+#the journey attributes a turn can change, in the order the session keeps their saved values
+PROGRESS_FIELDS = ('QuestionNumber', 'CurrentTurns', 'MoneyLevel', 'EnergyLevel', 'ActiveFlag')
+
+
+def _native(value):
+    #DynamoDB hands back Decimals; the game loop only needs ints
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return value
+
+
+class UserState(object):
+    """The parts of a user's profile record the game loop needs."""
+    __slots__ = ('user_id', 'player_number', 'max_turns', 'active_city_id')
+
+    def __init__(self, user_id, player_number, max_turns=0, active_city_id=None):
+        self.user_id = user_id
+        self.player_number = player_number
+        self.max_turns = max_turns
+        self.active_city_id = active_city_id  # None until known (records from before the pointer)
+
+    @classmethod
+    def from_item(cls, item):
+        return cls(
+            item['UserId'],
+            _native(item['PlayerNumber']),
+            _native(item.get('MaxTurns', 0)),
+            _native(item.get('ActiveCityId')))
+
+    def to_session(self):
+        return {
+            'v': SESSION_STATE_VERSION,
+            'userId': self.user_id,
+            'playerNumber': self.player_number,
+            'maxTurns': self.max_turns,
+            'activeCityId': self.active_city_id
+        }
+
+    @classmethod
+    def from_session(cls, data):
+        if 'Items' in data:
+            #raw query response stored by earlier versions of the skill
+            return cls.from_item(data['Items'][0])
+        if data.get('v') in (1, 2):
+            return cls(data['userId'], data['playerNumber'], data['maxTurns'], data['activeCityId'])
+        raise ValueError("Unsupported user session state version {}".format(data.get('v')))
+
+
+class JourneyState(object):
+    """The parts of a journey record the game loop needs."""
+    __slots__ = ('player_number', 'city_id', 'question_number', 'current_turns', 'money_level',
+                 'energy_level', 'active_flag', 'saved')
+
+    def __init__(self, player_number, city_id, question_number, current_turns, money_level, energy_level, active_flag,
+                 saved=None):
+        self.player_number = player_number
+        self.city_id = city_id
+        self.question_number = question_number
+        self.current_turns = current_turns
+        self.money_level = money_level
+        self.energy_level = energy_level
+        self.active_flag = active_flag
+        self.saved = saved  # PROGRESS_FIELDS values as last read or written (None if unknown)
+
+    @classmethod
+    def from_item(cls, item):
+        journey = cls(
+            _native(item['PlayerNumber']),
+            _native(item['CityId']),
+            _native(item['QuestionNumber']),
+            _native(item['CurrentTurns']),
+            _native(item['MoneyLevel']),
+            _native(item['EnergyLevel']),
+            item['ActiveFlag'])
+        journey.mark_saved()
+        return journey
+
+    def progress(self):
+        # type: () -> Dict[str, Any]
+        return dict(zip(PROGRESS_FIELDS, (self.question_number, self.current_turns, self.money_level,
+                                          self.energy_level, self.active_flag)))
+
+    def changes(self):
+        # type: () -> Dict[str, Any]
+        """The progress attributes that differ from the stored journey (all of them if that is unknown)."""
+        if self.saved is None:
+            return self.progress()
+        return persistence.changes(dict(zip(PROGRESS_FIELDS, self.saved)), self.progress())[0]
+
+    def mark_saved(self):
+        progress = self.progress()
+        self.saved = [progress[name] for name in PROGRESS_FIELDS]
+
+    def to_session(self):
+        return {
+            'v': SESSION_STATE_VERSION,
+            'playerNumber': self.player_number,
+            'cityId': self.city_id,
+            'questionNumber': self.question_number,
+            'currentTurns': self.current_turns,
+            'moneyLevel': self.money_level,
+            'energyLevel': self.energy_level,
+            'activeFlag': self.active_flag,
+            'saved': self.saved
+        }
+
+    @classmethod
+    def from_session(cls, data):
+        if 'Items' in data:
+            #raw query response stored (and changed in place) by earlier versions of the skill
+            journey = cls.from_item(data['Items'][0])
+            journey.saved = None
+            return journey
+        if data.get('v') in (1, 2):
+            #version 1 didn't keep the saved values, so everything is written on the next save
+            return cls(data['playerNumber'], data['cityId'], data['questionNumber'], data['currentTurns'],
+                       data['moneyLevel'], data['energyLevel'], data['activeFlag'], data.get('saved'))
+        raise ValueError("Unsupported journey session state version {}".format(data.get('v')))
+
+
+def _loaded(handler_input):
+    #objects deserialized during this request; flush_session_state writes them back
+    return handler_input.attributes_manager.request_attributes.setdefault(_REQUEST_KEY, {})
+
+
+def _get(handler_input, key, state_type):
+    loaded = _loaded(handler_input)
+    if key not in loaded:
+        loaded[key] = state_type.from_session(handler_input.attributes_manager.session_attributes[key])
+    return loaded[key]
+
+
+def _set(handler_input, key, state):
+    _loaded(handler_input)[key] = state
+    handler_input.attributes_manager.session_attributes[key] = state.to_session()
+
+
+def session_user(handler_input):
+    # type: (HandlerInput) -> UserState
+    """Return the user on the session; changes to it are saved back by flush_session_state."""
+    return _get(handler_input, USER_KEY, UserState)
+
+
+def session_journey(handler_input):
+    # type: (HandlerInput) -> JourneyState
+    """Return the journey on the session; changes to it are saved back by flush_session_state."""
+    return _get(handler_input, JOURNEY_KEY, JourneyState)
+
+
+def set_session_user(handler_input, user):
+    _set(handler_input, USER_KEY, user)
+
+
+def set_session_journey(handler_input, journey):
+    _set(handler_input, JOURNEY_KEY, journey)
+
+
+def flush_session_state(handler_input):
+    """Serialize every state object used in this request back into the session attributes."""
+    for key, state in _loaded(handler_input).items():
+        handler_input.attributes_manager.session_attributes[key] = state.to_session()
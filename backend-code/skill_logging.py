@@ -0,0 +1,99 @@
+import contextvars
+import json
+import logging
+import os
+import random
+
+#share of requests whose full request envelope and response are logged at info level;
+#with debug enabled every request is dumped regardless
+LOG_PAYLOAD_SAMPLE_RATE = float(os.environ.get('LOG_PAYLOAD_SAMPLE_RATE', '0'))
+#'json' emits one structured object per line, anything else leaves the Lambda format alone
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
+#tokens are dropped outright; identifiers keep a short suffix so lines can still be correlated
+SECRET_FIELDS = frozenset(['apiAccessToken', 'accessToken', 'consentToken', 'Authorization'])
+IDENTIFIER_FIELDS = frozenset(['userId', 'deviceId', 'personId', 'UserId'])
+
+_request_fields = contextvars.ContextVar('log_request_fields', default={})
+_payload_sampled = contextvars.ContextVar('log_payload_sampled', default=False)
+
+
+class Lazy(object):
+    """Defers building a log argument until a handler actually formats the record."""
+    __slots__ = ('fn',)
+
+    def __init__(self, fn):
+        self.fn = fn
+
+    def __str__(self):
+        return str(self.fn())
+
+
+def _mask(value):
+    if not isinstance(value, str) or len(value) <= 6:
+        return "***"
+    return "***" + value[-6:]
+
+
+def redact(value):
+    """Return a copy of a plain (JSON-shaped) value with tokens removed and identifiers masked."""
+    if isinstance(value, dict):
+        redacted = {}
+        for key, item in value.items():
+            if key in SECRET_FIELDS:
+                redacted[key] = "***"
+            elif key in IDENTIFIER_FIELDS:
+                redacted[key] = _mask(item)
+            else:
+                redacted[key] = redact(item)
+        return redacted
+    if isinstance(value, list):
+        return [redact(item) for item in value]
+    return value
+
+
+def _to_plain(obj):
+    from ask_sdk_core.serialize import DefaultSerializer
+    return DefaultSerializer().serialize(obj)
+
+
+def payload(obj):
+    """Lazily rendered, redacted JSON of an ASK model object (envelope, response, ...)."""
+    return Lazy(lambda: json.dumps(redact(_to_plain(obj)), separators=(',', ':'), default=str))
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, carrying the request fields bound by begin_request."""
+    def format(self, record):
+        entry = {'level': record.levelname, 'message': record.getMessage(), 'logger': record.name}
+        entry.update(_request_fields.get())
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, separators=(',', ':'), default=str)
+
+
+def configure(logger, level):
+    logger.setLevel(int(level))
+    if LOG_FORMAT == 'json':
+        #the Lambda runtime installs its own handler on the root logger; only swap its formatter
+        for handler in logger.handlers:
+            handler.setFormatter(JsonFormatter())
+
+
+def begin_request(request_id, intent):
+    """Bind the request fields for this invocation and decide whether its payloads are dumped."""
+    _request_fields.set({'requestId': request_id, 'intent': intent})
+    _payload_sampled.set(LOG_PAYLOAD_SAMPLE_RATE > 0 and random.random() < LOG_PAYLOAD_SAMPLE_RATE)
+
+
+def end_request():
+    _request_fields.set({})
+    _payload_sampled.set(False)
+
+
+def log_payload(logger, label, obj):
+    """Dump a full payload when debug is on or the request was sampled; otherwise costs nothing."""
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("%s: %s", label, payload(obj))
+    elif _payload_sampled.get() and logger.isEnabledFor(logging.INFO):
+        logger.info("%s: %s", label, payload(obj), extra={'fields': {'sampled': True}})
@@ -0,0 +1,108 @@
+import logging
+import re
+import threading
+import xml.etree.ElementTree as ElementTree
+
+from ask_sdk_model.ui import SsmlOutputSpeech, PlainTextOutputSpeech
+
+logger = logging.getLogger()
+
+#Alexa rejects a response whose outputSpeech exceeds 8000 characters or plays more than five audio clips
+MAX_SSML_CHARACTERS = 8000
+MAX_AUDIO_TAGS = 5
+
+#the Japanese phrases the guide says in the city's voice
+WELCOME = "ようこそ"
+ACKNOWLEDGE = "了解です"
+HELLO = "こんにちわ"
+GOOD_LUCK = "頑張って"
+GAME_OVER = "残念ですね"
+CAREFUL = "気をつけてください"
+
+#ASK wraps the speech in <speak>; the amazon: prefix has to be bound for a standard XML parser
+_SPEAK_OPEN = '<speak xmlns:amazon="urn:amazon">'
+_SPEAK_CLOSE = '</speak>'
+_TAG = re.compile(r'<[^>]+>')
+_SPACES = re.compile(r'\s+')
+
+
+class VoiceFragments(object):
+    """The SSML a city's guide speaks with, rendered once per voice instead of on every turn."""
+    __slots__ = ('voice', 'welcome', 'acknowledge', 'hello', 'good_luck', 'game_over', 'careful')
+
+    def __init__(self, voice):
+        self.voice = voice
+        self.welcome = japanese(voice, WELCOME)
+        self.acknowledge = japanese(voice, ACKNOWLEDGE)
+        self.hello = japanese(voice, HELLO)
+        self.good_luck = japanese(voice, GOOD_LUCK)
+        self.game_over = japanese(voice, GAME_OVER)
+        self.careful = japanese(voice, CAREFUL)
+
+
+def japanese(voice, phrase):
+    return '<voice name="{}"><lang xml:lang="ja-JP">{}</lang></voice>'.format(voice, phrase)
+
+
+def audio(url):
+    return '<audio src="{}" />'.format(url) if url else ""
+
+
+_fragments = {}
+_fragments_lock = threading.Lock()
+
+
+def fragments_for(voice):
+    # type: (str) -> VoiceFragments
+    fragments = _fragments.get(voice)
+    if fragments is None:
+        with _fragments_lock:
+            fragments = _fragments.setdefault(voice, VoiceFragments(voice))
+    return fragments
+
+
+def compose(*parts):
+    """Join speech parts in one pass, skipping empty ones."""
+    return "".join([part for part in parts if part])
+
+
+def to_plain_text(ssml):
+    return _SPACES.sub(" ", _TAG.sub(" ", ssml)).strip()
+
+
+def _truncate(text, limit):
+    if len(text) <= limit:
+        return text
+    #cut at the last sentence that fits so the guide doesn't stop mid-word
+    cut = text.rfind(". ", 0, limit - 1)
+    return text[:cut + 1] if cut > 0 else text[:limit]
+
+
+def problem(ssml):
+    # type: (str) -> Optional[str]
+    """Why Alexa would reject this speech (the inside of <speak>), or None if it is fine."""
+    if len(ssml) + len("<speak></speak>") > MAX_SSML_CHARACTERS:
+        return "{} characters".format(len(ssml))
+    if ssml.count("<audio") > MAX_AUDIO_TAGS:
+        return "{} audio tags".format(ssml.count("<audio"))
+    if "<" in ssml or "&" in ssml:
+        try:
+            ElementTree.fromstring(_SPEAK_OPEN + ssml + _SPEAK_CLOSE)
+        except ElementTree.ParseError as e:
+            return "malformed SSML ({})".format(e)
+    return None
+
+
+def safe_output_speech(output_speech):
+    """Return output_speech, or a plain-text equivalent when its SSML would be rejected."""
+    if not isinstance(output_speech, SsmlOutputSpeech) or not output_speech.ssml:
+        return output_speech
+    ssml = output_speech.ssml
+    if ssml.startswith("<speak>") and ssml.endswith(_SPEAK_CLOSE):
+        ssml = ssml[len("<speak>"):-len(_SPEAK_CLOSE)]
+    reason = problem(ssml)
+    if reason is None:
+        return output_speech
+    logger.error("Falling back to plain text speech: %s", reason)
+    return PlainTextOutputSpeech(text=_truncate(to_plain_text(ssml), MAX_SSML_CHARACTERS),
+                                 play_behavior=output_speech.play_behavior)
@@ -0,0 +1,212 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import data_access
+from content_bundle import get_bundle
+
+logger = logging.getLogger()
+
+#story content is the same for every player, so a warm container keeps whole cities in memory
+STORY_CACHE_TTL_SECONDS = int(os.environ.get('STORY_CACHE_TTL_SECONDS', '900'))
+STORY_CACHE_MAX_CITIES = int(os.environ.get('STORY_CACHE_MAX_CITIES', '8'))
+#how many questions past the current one a Yes/No turn fetches on a cache miss
+STORY_PREFETCH_QUESTIONS = int(os.environ.get('STORY_PREFETCH_QUESTIONS', '3'))
+
+
+class CityStory(object):
+    """The questions (JPExpStories) and answer details (JPExpStoryDetails) for one city.
+
+    A story is complete when it was loaded in full; a partial story only holds the items that
+    were fetched for individual turns, so a number it doesn't have may still exist in the table.
+    """
+    def __init__(self, city_id, questions, details, loaded_at=0, complete=True):
+        self.city_id = city_id
+        self.questions = questions  # QuestionNumber -> JPExpStories item
+        self.details = details      # QuestionNumber -> JPExpStoryDetails item
+        self.loaded_at = loaded_at
+        self.complete = complete
+
+    def get_question(self, question_number):
+        return self.questions.get(int(question_number))
+
+    def get_detail(self, question_number):
+        return self.details.get(int(question_number))
+
+    def has_question(self, question_number):
+        return self.complete or int(question_number) in self.questions
+
+    def has_detail(self, question_number):
+        return self.complete or int(question_number) in self.details
+
+
+class StoryCache(object):
+    """Process-level LRU cache of city stories with a TTL and hit/miss counters."""
+    def __init__(self, loader, turn_loader=None, ttl_seconds=STORY_CACHE_TTL_SECONDS, max_entries=STORY_CACHE_MAX_CITIES, clock=time.time):
+        self._loader = loader
+        self._turn_loader = turn_loader
+        self._ttl = ttl_seconds
+        self._max_entries = max_entries
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _fresh(self, city_id):
+        #caller holds the lock
+        story = self._entries.get(city_id)
+        if story is not None and self._clock() - story.loaded_at < self._ttl:
+            self._entries.move_to_end(city_id)
+            return story
+        return None
+
+    def get(self, city_id):
+        # type: (Any) -> CityStory
+        """Return the complete story for the city, loading it from the backing store on a miss or when expired."""
+        with self._lock:
+            story = self._fresh(city_id)
+            if story is not None and story.complete:
+                self.hits += 1
+                return story
+            self.misses += 1
+
+        #load outside the lock so a slow read does not block other cities
+        story = self._loader(city_id)
+        self.put(story)
+        return story
+
+    def get_question(self, city_id, question_number):
+        # type: (Any, int) -> Dict[str, Any]
+        """Return one question, served from a complete or partial story when it is already cached."""
+        with self._lock:
+            story = self._fresh(city_id)
+            if story is not None and story.has_question(question_number):
+                self.hits += 1
+                return story.get_question(question_number)
+        return self.get(city_id).get_question(question_number)
+
+    def get_detail(self, city_id, question_number):
+        # type: (Any, int) -> Dict[str, Any]
+        """Return one answer detail, served from a complete or partial story when it is already cached."""
+        with self._lock:
+            story = self._fresh(city_id)
+            if story is not None and story.has_detail(question_number):
+                self.hits += 1
+                return story.get_detail(question_number)
+        return self.get(city_id).get_detail(question_number)
+
+    def resolve_turn(self, city_id, question_number, prefetch=0):
+        # type: (Any, int, int) -> Tuple[Dict[str, Any], Dict[str, Any]]
+        """Return the answer detail for question_number and the question that follows it.
+
+        On a miss both items, plus the next `prefetch` questions and details of the city, come back
+        from a single batch read and are kept as a partial story for the following turns. Merging
+        them into a cached story keeps its load time, so the TTL still refreshes a busy city.
+        """
+        question_number = int(question_number)
+        with self._lock:
+            story = self._fresh(city_id)
+            if story is not None and story.has_detail(question_number) and story.has_question(question_number + 1):
+                self.hits += 1
+                return story.get_detail(question_number), story.get_question(question_number + 1)
+            self.misses += 1
+
+        if self._turn_loader is None:
+            story = self.get(city_id)
+            return story.get_detail(question_number), story.get_question(question_number + 1)
+
+        detail_numbers = list(range(question_number, question_number + prefetch + 1))
+        question_numbers = [n + 1 for n in detail_numbers]
+        questions, details, complete = self._turn_loader(city_id, question_numbers, detail_numbers)
+        if complete:
+            #the loader had the whole city anyway
+            self.put(CityStory(city_id, questions, details))
+            return details.get(question_number), questions.get(question_number + 1)
+
+        with self._lock:
+            story = self._fresh(city_id)
+            loaded_at = None
+            if story is None:
+                story = CityStory(city_id, {}, {}, complete=False)
+            else:
+                loaded_at = story.loaded_at
+            if not story.complete:
+                story.questions.update(questions)
+                story.details.update(details)
+        self.put(story, loaded_at)
+        return details.get(question_number), questions.get(question_number + 1)
+
+    def put(self, story, loaded_at=None):
+        """Cache a story as loaded now, or at loaded_at when it extends one that was already cached."""
+        with self._lock:
+            story.loaded_at = self._clock() if loaded_at is None else loaded_at
+            self._entries[story.city_id] = story
+            self._entries.move_to_end(story.city_id)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, city_id=None):
+        with self._lock:
+            if city_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(city_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries)
+            }
+
+
+def load_city_story(city_id):
+    # type: (Any) -> CityStory
+    """Read every question and answer detail of a city, from the content bundle when it has the city."""
+    logger.debug("in load_city_story - CityId: %s", city_id)
+    bundle = get_bundle()
+    if bundle is not None and bundle.has_city(city_id):
+        questions, details = bundle.story(city_id)
+        return CityStory(city_id, questions, details)
+
+    questions = data_access.query_all('JPExpStories', 'CityId', city_id)
+    details = data_access.query_all('JPExpStoryDetails', 'CityId', city_id)
+
+    return CityStory(
+        city_id,
+        dict((int(item['QuestionNumber']), item) for item in questions),
+        dict((int(item['QuestionNumber']), item) for item in details))
+
+
+def load_turn_items(city_id, question_numbers, detail_numbers):
+    # type: (Any, List[int], List[int]) -> Tuple[Dict[int, Any], Dict[int, Any], bool]
+    """Fetch specific questions and answer details of a city in one BatchGetItem.
+
+    The last element of the result tells whether the whole city came back (from the bundle).
+    """
+    logger.debug("in load_turn_items - CityId: %s questions: %s details: %s", city_id, question_numbers, detail_numbers)
+    bundle = get_bundle()
+    if bundle is not None and bundle.has_city(city_id):
+        #the bundle holds the whole city in memory already; hand all of it over
+        questions, details = bundle.story(city_id)
+        return questions, details, True
+
+    items = data_access.batch_get({
+        'JPExpStories': [{'CityId': city_id, 'QuestionNumber': n} for n in question_numbers],
+        'JPExpStoryDetails': [{'CityId': city_id, 'QuestionNumber': n} for n in detail_numbers]
+    })
+    return (
+        dict((int(item['QuestionNumber']), item) for item in items.get('JPExpStories', [])),
+        dict((int(item['QuestionNumber']), item) for item in items.get('JPExpStoryDetails', [])),
+        False)
+
+
+#shared by every invocation that lands on this container
+story_cache = StoryCache(load_city_story, load_turn_items)
@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+os.environ.setdefault('LOG_LEVEL', '40')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+sys.path.insert(0, os.path.join(ROOT, 'backend-code'))
+sys.path.insert(0, os.path.join(ROOT, 'tools'))
+
+import content_bundle  # noqa: E402
+import data_access  # noqa: E402
+from local_dynamodb import LocalDynamoDB, create_skill_tables, seed_sample_content  # noqa: E402
+
+
+@pytest.fixture
+def dynamodb():
+    """The skill's tables with the sample content, in the local stand-in; every read goes to them."""
+    dynamodb = seed_sample_content(create_skill_tables(LocalDynamoDB()))
+    data_access.set_resource(dynamodb)
+    content_bundle.set_bundle(None)
+    dynamodb.reset_calls()
+    yield dynamodb
+    data_access.set_resource(None)
@@ -0,0 +1,33 @@
+import json
+
+import data_access
+from city_registry import CityRegistry, load_cities
+from compile_content import build_bundle, check_bundle
+from content_bundle import ContentBundle, set_bundle
+from story_cache import load_city_story
+
+
+def test_a_numeric_city_id_is_served_from_the_bundle(dynamodb):
+    #a table that stores CityId as a number instead of the sample content's strings
+    dynamodb.Table('JPExpCities').put_item(Item={'CityId': 3, 'CityName': 'Osaka'})
+    for number in (1, 2):
+        dynamodb.Table('JPExpStories').put_item(Item={'CityId': 3, 'QuestionNumber': number, 'QuestionText': "Go?"})
+        dynamodb.Table('JPExpStoryDetails').put_item(Item={
+            'CityId': 3, 'QuestionNumber': number, 'YesResponseText': "You went.", 'NoResponseText': "You stayed.",
+            'YesWealthImpact': -5, 'YesEnergyImpact': 0, 'NoWealthImpact': 0, 'NoEnergyImpact': -5})
+    bundle = build_bundle(data_access.scan_all('JPExpCities'), data_access.scan_all('JPExpFunFacts'),
+                          data_access.scan_all('JPExpStories'), data_access.scan_all('JPExpStoryDetails'))
+    assert check_bundle(bundle) == []
+
+    #the skill reads the bundle back from its JSON file
+    set_bundle(ContentBundle.from_dict(json.loads(json.dumps(bundle))))
+    try:
+        dynamodb.reset_calls()
+        city = CityRegistry(load_cities).by_name('Osaka')
+        assert city.city_id == 3
+        story = load_city_story(city.city_id)
+        assert sorted(story.questions) == [1, 2]
+        assert story.get_detail(2)['NoEnergyImpact'] == -5
+    finally:
+        set_bundle(None)
+    assert sum(dynamodb.calls.values()) == 0
@@ -0,0 +1,73 @@
+import json
+
+import data_access
+import game_engine
+from game_engine import CONTINUE, GAME_OVER, NO, WARNING, YES, Levels
+
+
+def detail(yes_wealth=0, yes_energy=0, no_wealth=0, no_energy=0):
+    return {'YesWealthImpact': yes_wealth, 'YesEnergyImpact': yes_energy,
+            'NoWealthImpact': no_wealth, 'NoEnergyImpact': no_energy}
+
+
+def test_answer_applies_its_impact_and_advances_the_question():
+    turn = game_engine.play_turn(game_engine.starting_levels(), detail(yes_wealth=-5, yes_energy=3, no_wealth=7), YES)
+    assert turn == (Levels(1, 1, 45, 53), CONTINUE)
+
+    turn = game_engine.play_turn(turn.levels, detail(yes_wealth=-5, no_wealth=7, no_energy=-2), NO)
+    assert turn == (Levels(2, 2, 52, 51), CONTINUE)
+
+
+def test_low_money_or_energy_warns():
+    assert game_engine.play_turn(Levels(3, 3, 20, 50), detail(yes_wealth=-10), YES).outcome == WARNING
+    assert game_engine.play_turn(Levels(3, 3, 50, 20), detail(no_energy=-11), NO).outcome == WARNING
+
+
+def test_running_out_of_money_or_energy_ends_the_game():
+    assert game_engine.play_turn(Levels(3, 3, 10, 50), detail(yes_wealth=-10), YES) == (Levels(4, 4, 0, 50), GAME_OVER)
+    assert game_engine.play_turn(Levels(3, 3, 50, 5), detail(no_energy=-9), NO).outcome == GAME_OVER
+
+
+def test_story_details_from_dynamodb_play(dynamodb):
+    item = data_access.get_item('JPExpStoryDetails', {'CityId': '1', 'QuestionNumber': 1})
+    levels, outcome = game_engine.play_turn(game_engine.starting_levels(), item, YES)
+    assert levels.money_level == game_engine.STARTING_MONEY + int(item['YesWealthImpact'])
+    assert levels.energy_level == game_engine.STARTING_ENERGY + int(item['YesEnergyImpact'])
+    assert type(levels.money_level) is int
+
+
+def test_answer_for_text():
+    assert game_engine.answer_for_text('YesResponseText') == YES
+    assert game_engine.answer_for_text('NoResponseText') == NO
+
+
+def test_a_journey_that_already_ended_is_over_whatever_the_answer():
+    levels = Levels(4, 4, -2, 40)
+    assert game_engine.play_turn(levels, detail(yes_wealth=30, yes_energy=30), YES, active=False) == (levels, GAME_OVER)
+
+
+class Context(object):
+    def get_remaining_time_in_millis(self):
+        return 8000
+
+
+def test_yes_on_an_ended_journey_gets_the_game_over_message(dynamodb):
+    import lambda_function
+    from dispatch_benchmark import TEST_EVENT
+
+    with open(TEST_EVENT) as f:
+        event = json.load(f)
+    journey = {'v': 2, 'playerNumber': 1, 'cityId': '1', 'questionNumber': 4, 'currentTurns': 4,
+               'moneyLevel': -2, 'energyLevel': 40, 'activeFlag': 'N', 'saved': [4, 4, -2, 40, 'N']}
+    event['session']['new'] = False
+    event['session']['attributes'] = {
+        'city': 'Tokyo', 'stats_record': journey,
+        'user': {'v': 2, 'userId': event['session']['user']['userId'], 'playerNumber': 1, 'maxTurns': 4,
+                 'activeCityId': None}}
+    event['request'].update({'type': 'IntentRequest',
+                             'intent': {'name': 'AMAZON.YesIntent', 'confirmationStatus': 'NONE', 'slots': {}}})
+
+    response = lambda_function.handler(event, Context())
+    assert lambda_function.GAME_OVER_MESSAGE in response['response']['outputSpeech']['ssml']
+    stats = response['sessionAttributes']['stats_record']
+    assert (stats['questionNumber'], stats['moneyLevel'], stats['energyLevel']) == (4, -2, 40)
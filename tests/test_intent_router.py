@@ -0,0 +1,44 @@
+import json
+
+import pytest
+
+from dispatch_benchmark import TEST_EVENT, ExtraIntentHandler, handler_input_for
+from intent_router import IntentRouter
+
+
+@pytest.fixture(scope='module')
+def template():
+    with open(TEST_EVENT) as f:
+        return json.load(f)
+
+
+def test_every_route_goes_to_a_handler_that_accepts_it(template):
+    import lambda_function
+    routes = lambda_function.router.routes()
+    assert ('LaunchRequest', None) in routes
+    assert routes[('IntentRequest', 'AMAZON.CancelIntent')] is routes[('IntentRequest', 'AMAZON.StopIntent')]
+    for key, handler in routes.items():
+        handler_input = handler_input_for(template, key)
+        assert lambda_function.router.route(handler_input) is handler
+        #the route table and the handlers' own can_handle must describe the same routes
+        assert handler.can_handle(handler_input), key
+
+
+def test_the_router_registers_every_handler_once():
+    import lambda_function
+    handlers = lambda_function.router.handlers()
+    assert len(handlers) == len(set(map(id, handlers)))
+    assert set(map(id, handlers)) == set(map(id, lambda_function.router.routes().values()))
+
+
+def test_unrouted_requests_are_left_to_the_other_handlers(template):
+    router = IntentRouter().add(ExtraIntentHandler('KyotoIntent'), 'IntentRequest', 'KyotoIntent')
+    assert router.can_handle(handler_input_for(template, ('IntentRequest', 'KyotoIntent')))
+    assert not router.can_handle(handler_input_for(template, ('IntentRequest', 'OsakaIntent')))
+    assert not router.can_handle(handler_input_for(template, ('LaunchRequest', None)))
+
+
+def test_a_route_can_only_be_added_once():
+    router = IntentRouter().add(ExtraIntentHandler('KyotoIntent'), 'IntentRequest', 'KyotoIntent')
+    with pytest.raises(ValueError):
+        router.add(ExtraIntentHandler('KyotoIntent'), 'IntentRequest', 'KyotoIntent')
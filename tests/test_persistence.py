@@ -0,0 +1,54 @@
+import data_access
+import persistence
+
+JOURNEY_KEY = {'PlayerNumber': 42, 'CityId': '1'}
+
+
+def put_journey(**attributes):
+    item = dict(JOURNEY_KEY, QuestionNumber=3, CurrentTurns=3, MoneyLevel=40, EnergyLevel=45, ActiveFlag='Y')
+    item.update(attributes)
+    data_access.put_item('JPExpGameStats', Item=item)
+
+
+def test_changes_lists_changed_and_removed_attributes():
+    saved = {'QuestionNumber': 3, 'MoneyLevel': 40, 'Tip': "Bow."}
+    current = {'QuestionNumber': 4, 'MoneyLevel': 40, 'EnergyLevel': 45}
+    assert persistence.changes(saved, current) == ({'QuestionNumber': 4, 'EnergyLevel': 45}, ['Tip'])
+    assert persistence.changes(current, dict(current)) == ({}, [])
+
+
+def test_nothing_to_write_gives_no_update():
+    assert persistence.update_for('JPExpGameStats', JOURNEY_KEY, {}) is None
+
+
+def test_update_writes_only_the_changes(dynamodb):
+    put_journey(Date="2026-01-01")
+    changed, removed = persistence.changes({'QuestionNumber': 3, 'Date': "2026-01-01"}, {'QuestionNumber': 4})
+    update = persistence.update_for('JPExpGameStats', JOURNEY_KEY, changed, removed)
+
+    #attribute names go through placeholders, so reserved words such as Date are fine
+    assert 'Date' not in update['Update']['UpdateExpression']
+    assert data_access.write_transaction([update])
+    item = data_access.get_item('JPExpGameStats', JOURNEY_KEY)
+    assert item['QuestionNumber'] == 4
+    assert item['MoneyLevel'] == 40
+    assert 'Date' not in item
+
+
+def test_update_is_skipped_when_its_condition_fails(dynamodb):
+    put_journey(ActiveFlag='N')
+    update = persistence.update_for('JPExpGameStats', JOURNEY_KEY, {'MoneyLevel': 10},
+                                    condition="ActiveFlag=:a", condition_values={':a': 'Y'})
+    assert not data_access.write_transaction([update])
+    assert data_access.get_item('JPExpGameStats', JOURNEY_KEY)['MoneyLevel'] == 40
+
+
+def test_updates_of_two_tables_apply_together(dynamodb):
+    put_journey()
+    data_access.put_item('JPExpUsers', Item={'UserId': 'u', 'PlayerNumber': 42, 'MaxTurns': 2})
+    assert data_access.write_transaction([
+        persistence.update_for('JPExpGameStats', JOURNEY_KEY, {'CurrentTurns': 4}),
+        persistence.update_for('JPExpUsers', {'UserId': 'u', 'PlayerNumber': 42}, {'MaxTurns': 4})])
+    assert data_access.get_item('JPExpGameStats', JOURNEY_KEY)['CurrentTurns'] == 4
+    assert data_access.get_item('JPExpUsers', {'UserId': 'u', 'PlayerNumber': 42})['MaxTurns'] == 4
+    assert dynamodb.calls[('TransactWriteItems', 'JPExpGameStats,JPExpUsers')] == 1
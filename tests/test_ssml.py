@@ -0,0 +1,38 @@
+from ask_sdk_model.ui import PlainTextOutputSpeech, SsmlOutputSpeech
+
+import ssml
+
+
+def test_valid_speech_is_returned_unchanged():
+    speech = SsmlOutputSpeech(ssml="<speak>" + ssml.compose(
+        ssml.japanese("Takumi", ssml.WELCOME), " Welcome, explorer!", ssml.audio("https://example.com/gong.mp3")) + "</speak>")
+    assert ssml.safe_output_speech(speech) is speech
+
+
+def test_plain_text_and_missing_speech_pass_through():
+    speech = PlainTextOutputSpeech(text="Tom & Jerry <3")
+    assert ssml.safe_output_speech(speech) is speech
+    assert ssml.safe_output_speech(None) is None
+
+
+def test_malformed_ssml_falls_back_to_plain_text():
+    speech = SsmlOutputSpeech(ssml="<speak>Sushi & <emphasis>sake</speak>", play_behavior="REPLACE_ALL")
+    safe = ssml.safe_output_speech(speech)
+    assert isinstance(safe, PlainTextOutputSpeech)
+    assert safe.text == "Sushi & sake"
+    assert safe.play_behavior == "REPLACE_ALL"
+
+
+def test_too_many_audio_clips_fall_back_to_plain_text():
+    clips = [ssml.audio("https://example.com/{}.mp3".format(n)) for n in range(ssml.MAX_AUDIO_TAGS + 1)]
+    speech = SsmlOutputSpeech(ssml="<speak>Listen." + ssml.compose(*clips) + "</speak>")
+    assert ssml.safe_output_speech(speech).text == "Listen."
+
+
+def test_overlong_speech_is_cut_at_a_sentence():
+    sentence = "Kyoto has many temples. "
+    speech = SsmlOutputSpeech(ssml="<speak>" + sentence * 400 + "</speak>")
+    safe = ssml.safe_output_speech(speech)
+    assert isinstance(safe, PlainTextOutputSpeech)
+    assert len(safe.text) <= ssml.MAX_SSML_CHARACTERS
+    assert safe.text.endswith("temples.")
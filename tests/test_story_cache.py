@@ -0,0 +1,92 @@
+from content_bundle import ContentBundle, set_bundle
+from story_cache import CityStory, StoryCache, load_city_story, load_turn_items
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def counting_loader(calls):
+    def load(city_id):
+        calls.append(city_id)
+        return CityStory(city_id, {1: {'QuestionNumber': 1}}, {1: {'QuestionNumber': 1}})
+    return load
+
+
+def test_get_serves_from_memory_until_the_ttl_passes():
+    calls = []
+    clock = Clock()
+    cache = StoryCache(counting_loader(calls), ttl_seconds=60, clock=clock)
+
+    cache.get('1')
+    clock.now += 59
+    cache.get('1')
+    assert calls == ['1']
+
+    clock.now += 1
+    cache.get('1')
+    assert calls == ['1', '1']
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 2
+
+
+def test_least_recently_used_city_is_evicted():
+    calls = []
+    cache = StoryCache(counting_loader(calls), max_entries=2, clock=Clock())
+
+    cache.get('1')
+    cache.get('2')
+    cache.get('1')
+    cache.get('3')
+    assert cache.stats()['evictions'] == 1
+
+    cache.get('1')
+    cache.get('2')
+    assert calls == ['1', '2', '3', '2']
+
+
+def test_resolve_turn_prefetches_the_following_turns(dynamodb):
+    cache = StoryCache(load_city_story, load_turn_items, clock=Clock())
+
+    detail, question = cache.resolve_turn('1', 3, prefetch=2)
+    assert int(detail['QuestionNumber']) == 3
+    assert int(question['QuestionNumber']) == 4
+    assert sum(dynamodb.calls.values()) == 1
+
+    for number in (4, 5):
+        detail, question = cache.resolve_turn('1', number, prefetch=2)
+        assert int(question['QuestionNumber']) == number + 1
+    assert sum(dynamodb.calls.values()) == 1
+
+
+def test_merging_a_partial_story_keeps_its_load_time(dynamodb):
+    clock = Clock()
+    cache = StoryCache(load_city_story, load_turn_items, ttl_seconds=60, clock=clock)
+
+    cache.resolve_turn('1', 1)
+    clock.now += 30
+    cache.resolve_turn('1', 5)
+    clock.now += 30
+    #the merge at +30s must not restart the TTL, so the first turn's items are read again
+    cache.resolve_turn('1', 1)
+    assert dynamodb.calls[('BatchGetItem', 'JPExpStories,JPExpStoryDetails')] == 3
+
+
+def test_a_city_from_the_bundle_is_cached_as_complete(dynamodb):
+    set_bundle(ContentBundle.from_dict({
+        'version': 'test', 'cities': [{'CityId': '1'}], 'funFacts': [],
+        'stories': {'1': {'questions': {'1': {'Q': 1}, '2': {'Q': 2}}, 'details': {'1': {'D': 1}}}}}))
+    try:
+        cache = StoryCache(load_city_story, load_turn_items, clock=Clock())
+        assert cache.resolve_turn('1', 1) == ({'D': 1}, {'Q': 2})
+        assert cache._entries['1'].complete
+        #a complete story answers a question it doesn't have without another load
+        assert cache.get_question('1', 7) is None
+        assert cache.stats()['misses'] == 1
+    finally:
+        set_bundle(None)
+    assert sum(dynamodb.calls.values()) == 0
@@ -0,0 +1,136 @@
+"""Compile the skill's content tables into the bundle that ships with the Lambda package.
+
+Exports JPExpCities, JPExpFunFacts, JPExpStories and JPExpStoryDetails into one compact JSON
+artifact indexed by CityId and QuestionNumber. The version is a hash of the content, so an
+unchanged story compiles to the same version. At runtime content_bundle.py serves the cities,
+facts and stories from it, and anything it doesn't have is read from DynamoDB.
+
+    python tools/compile_content.py                    # from the tables in AWS_DEFAULT_REGION
+    python tools/compile_content.py --sample --output /tmp/content_bundle.json
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import sys
+from decimal import Decimal
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+BACKEND_DIR = os.path.join(ROOT, 'backend-code')
+DEFAULT_OUTPUT = os.path.join(BACKEND_DIR, 'content_bundle.json')
+
+os.environ.setdefault('LOG_LEVEL', '40')
+sys.path.insert(0, BACKEND_DIR)
+
+
+def _plain(value):
+    #DynamoDB numbers come back as Decimal; the bundle stores them as JSON numbers
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, dict):
+        return dict((k, _plain(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return [_plain(v) for v in value]
+    if isinstance(value, set):
+        return sorted(_plain(v) for v in value)
+    return value
+
+
+def _index(items):
+    #JSON object keys are strings, so key by the CityId as the skill passes it (a str), whatever its type in DynamoDB
+    stories = {}
+    for item in items:
+        stories.setdefault(str(_plain(item['CityId'])), {})[str(int(item['QuestionNumber']))] = _plain(item)
+    return stories
+
+
+def build_bundle(cities, fun_facts, questions, details):
+    """Assemble the bundle dictionary from raw table items."""
+    from content_bundle import BUNDLE_FORMAT
+
+    questions_by_city = _index(questions)
+    details_by_city = _index(details)
+    content = {
+        'cities': sorted((_plain(c) for c in cities), key=lambda c: str(c['CityId'])),
+        'funFacts': [f['Text'] for f in sorted(fun_facts, key=lambda f: str(f['RecordNumber']))],
+        'stories': dict((city_id, {
+            'questions': questions_by_city.get(city_id, {}),
+            'details': details_by_city.get(city_id, {})
+        }) for city_id in sorted(set(questions_by_city) | set(details_by_city)))
+    }
+    canonical = json.dumps(content, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    bundle = {
+        'format': BUNDLE_FORMAT,
+        'version': hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16],
+        'compiledAt': datetime.datetime.utcnow().replace(microsecond=0).isoformat() + 'Z'
+    }
+    bundle.update(content)
+    return bundle
+
+
+def check_bundle(bundle):
+    """Return a list of content problems the skill would hit at runtime."""
+    problems = []
+    city_ids = set(str(c['CityId']) for c in bundle['cities'])
+    for city_id, story in sorted(bundle['stories'].items()):
+        if city_id not in city_ids:
+            problems.append("story for unknown city {}".format(city_id))
+        numbers = sorted(int(n) for n in story['questions'])
+        if numbers and numbers != list(range(1, numbers[-1] + 1)):
+            problems.append("city {} skips question numbers".format(city_id))
+        for number in numbers:
+            if str(number) not in story['details']:
+                problems.append("city {} question {} has no answer detail".format(city_id, number))
+    return problems
+
+
+def write_bundle(bundle, path):
+    #write next to the target and rename so a half-written bundle never ships
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(json.dumps(bundle, separators=(',', ':'), ensure_ascii=False).encode('utf-8'))
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--sample', action='store_true',
+                        help="compile the synthetic content of the local DynamoDB stand-in instead of AWS")
+    parser.add_argument('--strict', action='store_true', help="fail when the content check finds problems")
+    args = parser.parse_args()
+
+    import data_access
+    import content_bundle
+
+    if args.sample:
+        from local_dynamodb import LocalDynamoDB, create_skill_tables, seed_sample_content
+        data_access.set_resource(seed_sample_content(create_skill_tables(LocalDynamoDB())))
+
+    bundle = build_bundle(
+        data_access.scan_all('JPExpCities'),
+        data_access.scan_all('JPExpFunFacts'),
+        data_access.scan_all('JPExpStories'),
+        data_access.scan_all('JPExpStoryDetails'))
+
+    problems = check_bundle(bundle)
+    for problem in problems:
+        print("warning: " + problem)
+    if problems and args.strict:
+        return 1
+
+    write_bundle(bundle, args.output)
+    #read it back the way the skill will, so a bundle the runtime rejects fails the build
+    loaded = content_bundle.read_bundle(args.output, expected_version=bundle['version'])
+    if loaded is None:
+        print("the compiled bundle does not load")
+        return 1
+    print("content bundle {} -> {}: {} cities, {} stories, {} fun facts, {} bytes".format(
+        bundle['version'], args.output, len(bundle['cities']), len(bundle['stories']),
+        len(bundle['funFacts']), os.path.getsize(args.output)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
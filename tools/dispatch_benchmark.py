@@ -0,0 +1,109 @@
+"""Micro-benchmark of request dispatch: the ASK can_handle chain against the intent router.
+
+Builds a handler input for every route of lambda_function.router from the sample test event and
+times the ASK request mapper on it twice: once with each skill handler registered separately
+(the dispatcher asks can_handle in order), and once with the router as the only handler.
+--extra-intents registers that many more intent handlers, ahead of the skill's, to show how
+both grow as intents are added.
+
+    python tools/dispatch_benchmark.py --iterations 20000 --extra-intents 0 50 200
+"""
+import argparse
+import copy
+import json
+import os
+import sys
+import timeit
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+BACKEND_DIR = os.path.join(ROOT, 'backend-code')
+TEST_EVENT = os.path.join(ROOT, 'test-events', 'alexaTestEvent.json')
+
+os.environ.setdefault('LOG_LEVEL', '40')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+sys.path.insert(0, BACKEND_DIR)
+
+import ask_sdk_core.utils as ask_utils  # noqa: E402
+from ask_sdk_core.dispatch_components import AbstractRequestHandler  # noqa: E402
+
+
+class ExtraIntentHandler(AbstractRequestHandler):
+    """Stands in for a future intent handler with the skill's usual can_handle."""
+    def __init__(self, intent_name):
+        self.intent_name = intent_name
+
+    def can_handle(self, handler_input):
+        return ask_utils.is_intent_name(self.intent_name)(handler_input)
+
+    def handle(self, handler_input):
+        return None
+
+
+def request_for(key):
+    request_type, name = key
+    if request_type == 'IntentRequest':
+        return {'type': request_type, 'intent': {'name': name, 'confirmationStatus': 'NONE', 'slots': {}}}
+    if request_type == 'Connections.Response':
+        return {'type': request_type, 'name': name, 'status': {'code': '200', 'message': 'OK'}, 'payload': {}}
+    if request_type == 'SessionEndedRequest':
+        return {'type': request_type, 'reason': 'USER_INITIATED'}
+    return {'type': request_type}
+
+
+def handler_input_for(template, key):
+    from ask_sdk_core.handler_input import HandlerInput
+    from ask_sdk_core.serialize import DefaultSerializer
+    event = copy.deepcopy(template)
+    event['request'].update(request_for(key))
+    envelope = DefaultSerializer().deserialize(json.dumps(event), 'ask_sdk_model.RequestEnvelope')
+    return HandlerInput(request_envelope=envelope)
+
+
+def mapper_for(handlers):
+    from ask_sdk_runtime.dispatch_components import GenericRequestHandlerChain, GenericRequestMapper
+    return GenericRequestMapper([GenericRequestHandlerChain(request_handler=h) for h in handlers])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--extra-intents', type=int, nargs='+', default=[0, 50, 200])
+    args = parser.parse_args()
+
+    import lambda_function
+    from intent_router import IntentRouter
+
+    with open(TEST_EVENT) as f:
+        template = json.load(f)
+    skill_handlers = lambda_function.router.handlers()
+    routes = lambda_function.router.routes()
+    keys = sorted(routes, key=lambda key: (key[0], key[1] or ''))
+
+    print("{:>6}  {:<44} {:>10} {:>10}".format('extra', 'route', 'chain us', 'router us'))
+    for extra in args.extra_intents:
+        extras = [ExtraIntentHandler("City{}Intent".format(n)) for n in range(extra)]
+        router = IntentRouter()
+        for handler in extras:
+            router.add(handler, 'IntentRequest', handler.intent_name)
+        for key in keys:
+            router.add(routes[key], *[part for part in key if part])
+        chain = mapper_for(extras + skill_handlers)
+        routed = mapper_for([router])
+
+        totals = [0.0, 0.0]
+        for key in keys:
+            handler_input = handler_input_for(template, key)
+            expected = lambda_function.router.route(handler_input)
+            assert chain.get_request_handler_chain(handler_input).request_handler is expected
+            assert routed.get_request_handler_chain(handler_input).request_handler.route(handler_input) is expected
+            timings = [timeit.timeit(lambda: mapper.get_request_handler_chain(handler_input),
+                                     number=args.iterations) / args.iterations * 1e6
+                       for mapper in (chain, routed)]
+            totals = [t + s for t, s in zip(totals, timings)]
+            print("{:>6}  {:<44} {:>10.2f} {:>10.2f}".format(extra, " ".join(part for part in key if part), *timings))
+        print("{:>6}  {:<44} {:>10.2f} {:>10.2f}\n".format(extra, 'mean', totals[0] / len(keys), totals[1] / len(keys)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
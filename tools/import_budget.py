@@ -0,0 +1,71 @@
+"""Measure the cold-start import cost of the skill's Lambda module.
+
+Runs `python -X importtime -c "import lambda_function"` in fresh interpreters, takes the median of
+each module's self and cumulative import time, and prints the most expensive modules. With
+--budget-ms the script exits non-zero when the total import time of lambda_function exceeds it.
+
+    python tools/import_budget.py --runs 7 --top 25 --budget-ms 400
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'backend-code')
+ENTRY_MODULE = 'lambda_function'
+
+
+def measure_once(module):
+    env = dict(os.environ)
+    env.setdefault('LOG_LEVEL', '40')
+    env.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True, check=False)
+    if result.returncode != 0:
+        raise SystemExit("import {} failed:\n{}".format(module, result.stderr[-2000:]))
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        #import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default=ENTRY_MODULE)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--budget-ms', type=float, default=None)
+    args = parser.parse_args()
+
+    runs = [measure_once(args.module) for _ in range(args.runs)]
+    names = set()
+    for run in runs:
+        names.update(run)
+
+    medians = {}
+    for name in names:
+        samples = [run[name] for run in runs if name in run]
+        medians[name] = (statistics.median(s[0] for s in samples), statistics.median(s[1] for s in samples))
+
+    print("{:>10} {:>12}  {}".format('self ms', 'cumul. ms', 'module'))
+    for name, (self_us, cumulative_us) in sorted(medians.items(), key=lambda kv: kv[1][1], reverse=True)[:args.top]:
+        print("{:>10.1f} {:>12.1f}  {}".format(self_us / 1000.0, cumulative_us / 1000.0, name))
+
+    total_ms = medians[args.module][1] / 1000.0
+    print("\n{} import: {:.1f} ms (median of {} runs)".format(args.module, total_ms, args.runs))
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        print("over budget by {:.1f} ms".format(total_ms - args.budget_ms))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
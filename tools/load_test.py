@@ -0,0 +1,231 @@
+"""Concurrent multi-turn session load generator for the skill's Lambda handler.
+
+Each simulated session starts from test-events/alexaTestEvent.json and plays
+Launch -> StartJapanExplorerIntent(city) -> N Yes/No turns -> SpeakToGuide -> SessionEnded,
+feeding the sessionAttributes of every response into the next request. Sessions run
+concurrently against lambda_function.handler in this process, backed by the local DynamoDB
+stand-in, and the run reports throughput, p50/p95/p99 latency per intent and DynamoDB calls per
+turn. The skill answers most failures instead of raising, so a turn also counts as an error when
+it logs at ERROR, answers with the exception handler's speech, or loses the session state.
+
+    python tools/load_test.py --sessions 2000 --concurrency 64 --turns 8 --latency-ms 6
+"""
+import argparse
+import concurrent.futures
+import contextvars
+import copy
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+BACKEND_DIR = os.path.join(ROOT, 'backend-code')
+TEST_EVENT = os.path.join(ROOT, 'test-events', 'alexaTestEvent.json')
+
+os.environ.setdefault('LOG_LEVEL', '40')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+sys.path.insert(0, BACKEND_DIR)
+
+from local_dynamodb import LocalDynamoDB, create_skill_tables, seed_sample_content  # noqa: E402
+
+TIP_PRODUCT_ID = "amzn1.adg.product.local-travel-tip"
+LAMBDA_TIMEOUT_MILLIS = 8000
+
+#backend calls made by the current turn; run_parallel copies the context, so fan-out calls count too
+_turn_calls = contextvars.ContextVar('turn_calls', default=None)
+#errors logged by the current turn; the skill's exception handlers log and answer instead of raising
+_turn_errors = contextvars.ContextVar('turn_errors', default=None)
+
+
+class CountingDynamoDB(LocalDynamoDB):
+    def _enter(self, operation, table_name):
+        calls = _turn_calls.get()
+        if calls is not None:
+            calls.append(operation)
+        super(CountingDynamoDB, self)._enter(operation, table_name)
+
+
+class TurnErrorHandler(logging.Handler):
+    """Collects the ERROR records the skill logs while a turn is being handled."""
+    def __init__(self):
+        super(TurnErrorHandler, self).__init__(logging.ERROR)
+
+    def emit(self, record):
+        errors = _turn_errors.get()
+        if errors is not None:
+            errors.append(record.getMessage())
+
+
+class LambdaContext(object):
+    def __init__(self, timeout_millis=LAMBDA_TIMEOUT_MILLIS):
+        self._deadline = time.time() + timeout_millis / 1000.0
+
+    def get_remaining_time_in_millis(self):
+        return int((self._deadline - time.time()) * 1000)
+
+
+def intent_request(name, slots=None):
+    return {
+        'type': 'IntentRequest',
+        'intent': {'name': name, 'confirmationStatus': 'NONE', 'slots': slots or {}}
+    }
+
+
+def session_script(rng, cities, turns):
+    city = rng.choice(cities)
+    script = [('LaunchRequest', {'type': 'LaunchRequest'}),
+              ('StartJapanExplorerIntent', intent_request('StartJapanExplorerIntent', {
+                  'city': {'name': 'city', 'value': city, 'confirmationStatus': 'NONE'}}))]
+    for _ in range(turns):
+        name = rng.choice(('AMAZON.YesIntent', 'AMAZON.NoIntent'))
+        script.append((name, intent_request(name)))
+    script.append(('SpeakToGuideIntent', intent_request('SpeakToGuideIntent')))
+    script.append(('SessionEndedRequest', {'type': 'SessionEndedRequest', 'reason': 'USER_INITIATED'}))
+    return script
+
+
+class Results(object):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.calls = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.error_messages = defaultdict(int)
+
+    def record(self, intent, seconds, calls, error):
+        with self._lock:
+            self.latencies[intent].append(seconds)
+            self.calls[intent].append(calls)
+            if error:
+                self.errors[intent] += 1
+                self.error_messages[error] += 1
+
+
+def turn_error(turn, intent, response, logged):
+    # type: (int, str, Dict[str, Any], List[str]) -> str
+    """Why a turn that returned a response failed, or None if it didn't."""
+    from lambda_function import ERROR_MESSAGE
+
+    if logged:
+        return logged[0]
+    speech = ((response.get('response') or {}).get('outputSpeech') or {}).get('ssml', '')
+    if ERROR_MESSAGE in speech:
+        return "exception handler response"
+    #a new player's launch has nothing on the session yet; every turn of the journey does
+    if turn > 0 and intent != 'SessionEndedRequest' and not response.get('sessionAttributes'):
+        return "response without sessionAttributes"
+    return None
+
+
+def run_session(session_number, template, handler, results, args):
+    from entitlements import entitlement_cache
+
+    rng = random.Random(args.seed * 1000003 + session_number)
+    user_id = "amzn1.ask.account.load-{}".format(session_number)
+    #the monetization service isn't available offline; decide entitlement up front
+    entitlement_cache.put(user_id, template['request']['locale'], [{
+        'productId': TIP_PRODUCT_ID, 'summary': "Japan travel tips", 'entitled': rng.random() < args.entitled_share}])
+
+    attributes = {}
+    for turn, (intent, request) in enumerate(session_script(rng, args.cities, args.turns)):
+        event = copy.deepcopy(template)
+        event['session']['new'] = turn == 0
+        event['session']['sessionId'] = "amzn1.echo-api.session.load-{}".format(session_number)
+        event['session']['attributes'] = attributes
+        event['session']['user']['userId'] = user_id
+        event['context']['System']['user']['userId'] = user_id
+        event['request'].update(request)
+        event['request']['requestId'] = "amzn1.echo-api.request.load-{}-{}".format(session_number, turn)
+
+        calls = []
+        logged = []
+        calls_token = _turn_calls.set(calls)
+        errors_token = _turn_errors.set(logged)
+        start = time.perf_counter()
+        try:
+            response = handler(event, LambdaContext())
+            elapsed = time.perf_counter() - start
+            attributes = response.get('sessionAttributes') or {}
+            error = turn_error(turn, intent, response, logged)
+        except Exception as e:
+            elapsed = time.perf_counter() - start
+            error = "{}: {}".format(type(e).__name__, e)
+        finally:
+            _turn_calls.reset(calls_token)
+            _turn_errors.reset(errors_token)
+        results.record(intent, elapsed, len(calls), error)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def report(results, wall_seconds, sessions):
+    turns = sum(len(v) for v in results.latencies.values())
+    print("{} sessions, {} turns in {:.2f}s: {:.1f} turns/s, {:.1f} sessions/s".format(
+        sessions, turns, wall_seconds, turns / wall_seconds, sessions / wall_seconds))
+    print("{:<26} {:>7} {:>9} {:>9} {:>9} {:>11} {:>7}".format(
+        'intent', 'turns', 'p50 ms', 'p95 ms', 'p99 ms', 'calls/turn', 'errors'))
+    for intent in sorted(results.latencies):
+        latencies = sorted(results.latencies[intent])
+        calls = results.calls[intent]
+        print("{:<26} {:>7} {:>9.2f} {:>9.2f} {:>9.2f} {:>11.2f} {:>7}".format(
+            intent, len(latencies),
+            percentile(latencies, 0.50) * 1000, percentile(latencies, 0.95) * 1000,
+            percentile(latencies, 0.99) * 1000, float(sum(calls)) / len(calls), results.errors[intent]))
+    for message, count in sorted(results.error_messages.items(), key=lambda entry: -entry[1])[:5]:
+        print("{:>7}x {}".format(count, message))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--turns', type=int, default=6, help="Yes/No turns per session")
+    parser.add_argument('--cities', nargs='+', default=['Tokyo', 'Kyoto'])
+    parser.add_argument('--questions', type=int, default=30, help="questions per synthetic city story")
+    parser.add_argument('--latency-ms', type=float, default=5.0, help="injected latency per DynamoDB call")
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--entitled-share', type=float, default=0.5, help="share of players owning the tip product")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    dynamodb = CountingDynamoDB(seed=args.seed)
+    seed_sample_content(create_skill_tables(dynamodb), cities=args.cities,
+                        questions_per_city=args.questions, seed=args.seed)
+    #latency applies to the measured run only, not to seeding
+    dynamodb.latency_ms = args.latency_ms
+    dynamodb.throttle_rate = args.throttle_rate
+
+    #the APL documents are read relative to the module, the rest of the skill is cwd-independent
+    import data_access
+    import lambda_function
+    import metrics
+    data_access.set_resource(dynamodb)
+    #the per-invocation EMF lines would bury the report
+    metrics.set_sink(None)
+    logging.getLogger().addHandler(TurnErrorHandler())
+
+    with open(TEST_EVENT) as f:
+        template = json.load(f)
+
+    results = Results()
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [pool.submit(run_session, n, template, lambda_function.handler, results, args)
+                   for n in range(args.sessions)]
+        for future in futures:
+            future.result()
+    report(results, time.perf_counter() - start, args.sessions)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,422 @@
+"""In-process stand-in for the DynamoDB tables used by the Japan Explorer skill.
+
+It implements the slice of the boto3 resource API the skill relies on: Table.query (including
+global secondary indexes), get_item, put_item, update_item, scan, batch_writer, the resource's
+batch_get_item, and the client's transact_write_items, batch_write_item and describe_table.
+String condition and update expressions are supported for the forms the skill uses. Values are
+round-tripped through boto3's type (de)serializers, so numbers come back as Decimal just like
+from the real service.
+
+Latency and throttling can be injected to profile handlers deterministically without AWS:
+
+    import data_access
+    from local_dynamodb import LocalDynamoDB, create_skill_tables
+
+    dynamodb = LocalDynamoDB(latency_ms=8, throttle_rate=0.01, seed=7)
+    create_skill_tables(dynamodb)
+    data_access.set_resource(dynamodb)
+"""
+import copy
+import random
+import re
+import threading
+import time
+from collections import Counter
+
+from boto3.dynamodb.conditions import ConditionBase
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.exceptions import ClientError
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+
+def _normalize(value):
+    #what the real resource would hand back: ints become Decimal, sets stay sets, etc.
+    return _deserializer.deserialize(_serializer.serialize(value))
+
+
+def _error(code, message, operation, **extra):
+    response = {'Error': {'Code': code, 'Message': message}}
+    response.update(extra)
+    return ClientError(response, operation)
+
+
+def _capacity_by_table(units, kwargs):
+    #multi-table operations report a ConsumedCapacity list with one entry per table
+    if kwargs.get('ReturnConsumedCapacity') not in ('TOTAL', 'INDEXES'):
+        return {}
+    totals = Counter()
+    for table_name, amount in units:
+        totals[table_name] += amount
+    return {'ConsumedCapacity': [{'TableName': table_name, 'CapacityUnits': amount}
+                                 for table_name, amount in sorted(totals.items())]}
+
+
+class _LocalTable(object):
+    def __init__(self, db, name, hash_key, range_key=None, indexes=None):
+        self._db = db
+        self.name = name
+        self.table_name = name
+        self.hash_key = hash_key
+        self.range_key = range_key
+        self.indexes = indexes or {}  # index name -> (hash_key, range_key)
+        self.items = {}
+
+    #--- helpers ---------------------------------------------------------------
+    def _key_of(self, item):
+        if self.hash_key not in item or (self.range_key and self.range_key not in item):
+            raise _error('ValidationException', 'The provided key element does not match the schema', 'PutItem')
+        return (item[self.hash_key], item[self.range_key] if self.range_key else None)
+
+    def _capacity(self, units, kwargs):
+        if kwargs.get('ReturnConsumedCapacity') in ('TOTAL', 'INDEXES'):
+            return {'ConsumedCapacity': {'TableName': self.name, 'CapacityUnits': units}}
+        return {}
+
+    #--- reads -----------------------------------------------------------------
+    def get_item(self, Key, **kwargs):
+        self._db._enter('GetItem', self.name)
+        #reads hold the same lock as writers, so the fan-out threads never see a half-applied write
+        with self._db._lock:
+            item = copy.deepcopy(self.items.get(self._key_of(_normalize(Key))))
+        response = self._capacity(0.5, kwargs)
+        if item is not None:
+            response['Item'] = item
+        return response
+
+    def query(self, KeyConditionExpression, IndexName=None, ScanIndexForward=True, Limit=None, **kwargs):
+        self._db._enter('Query', self.name)
+        hash_key, range_key = (self.hash_key, self.range_key) if IndexName is None else self.indexes[IndexName]
+        with self._db._lock:
+            matches = [copy.deepcopy(item) for item in self.items.values()
+                       if hash_key in item and _evaluate_key_condition(KeyConditionExpression, item)]
+        if range_key:
+            matches.sort(key=lambda item: item.get(range_key), reverse=not ScanIndexForward)
+        if Limit is not None:
+            matches = matches[:Limit]
+        response = {'Items': matches, 'Count': len(matches), 'ScannedCount': len(matches)}
+        response.update(self._capacity(max(0.5, 0.5 * len(matches)), kwargs))
+        return response
+
+    def scan(self, **kwargs):
+        self._db._enter('Scan', self.name)
+        with self._db._lock:
+            matches = [copy.deepcopy(item) for item in self.items.values()]
+        response = {'Items': matches, 'Count': len(matches), 'ScannedCount': len(matches)}
+        response.update(self._capacity(max(0.5, 0.5 * len(matches)), kwargs))
+        return response
+
+    #--- writes ----------------------------------------------------------------
+    def put_item(self, Item, ConditionExpression=None, ExpressionAttributeNames=None,
+                 ExpressionAttributeValues=None, **kwargs):
+        self._db._enter('PutItem', self.name)
+        with self._db._lock:
+            self._check_put(Item, ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues, 'PutItem')
+            self._apply_put(Item)
+        return self._capacity(1.0, kwargs)
+
+    def update_item(self, Key, UpdateExpression, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, ReturnValues='NONE', **kwargs):
+        self._db._enter('UpdateItem', self.name)
+        with self._db._lock:
+            self._check_update(Key, ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues, 'UpdateItem')
+            new_item = self._apply_update(Key, UpdateExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+        response = self._capacity(1.0, kwargs)
+        if ReturnValues in ('ALL_NEW', 'UPDATED_NEW'):
+            response['Attributes'] = copy.deepcopy(new_item)
+        return response
+
+    def batch_writer(self, overwrite_by_pkeys=None):
+        return _BatchWriter(self)
+
+    def _check_put(self, item, condition, names, values, operation):
+        existing = self.items.get(self._key_of(_normalize(item)))
+        if condition and not _evaluate_condition(condition, existing or {}, names, values):
+            raise _error('ConditionalCheckFailedException', 'The conditional request failed', operation)
+
+    def _check_update(self, key, condition, names, values, operation):
+        existing = self.items.get(self._key_of(_normalize(key)))
+        if condition and not _evaluate_condition(condition, existing or {}, names, values):
+            raise _error('ConditionalCheckFailedException', 'The conditional request failed', operation)
+
+    def _apply_put(self, item):
+        item = _normalize(item)
+        self.items[self._key_of(item)] = item
+
+    def _apply_update(self, key, expression, names, values):
+        key = _normalize(key)
+        item = self.items.setdefault(self._key_of(key), dict(key))
+        _apply_update_expression(item, expression, names or {}, _normalize(values or {}))
+        return item
+
+
+class _BatchWriter(object):
+    def __init__(self, table):
+        self._table = table
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def put_item(self, Item):
+        self._table.put_item(Item=Item)
+
+    def delete_item(self, Key):
+        self._table._db._enter('DeleteItem', self._table.name)
+        with self._table._db._lock:
+            self._table.items.pop(self._table._key_of(_normalize(Key)), None)
+
+
+class _LocalClient(object):
+    def __init__(self, db):
+        self._db = db
+
+    def describe_table(self, TableName):
+        self._db._enter('DescribeTable', TableName)
+        table = self._db._table(TableName)
+        with self._db._lock:
+            count = len(table.items)
+        return {'Table': {'TableName': TableName, 'ItemCount': count}}
+
+    def transact_write_items(self, TransactItems, **kwargs):
+        self._db._enter('TransactWriteItems', ','.join(
+            sorted(set(list(item.values())[0]['TableName'] for item in TransactItems))))
+        requests = []
+        for item in TransactItems:
+            (action, request), = item.items()
+            request = dict(request)
+            for field in ('Key', 'Item', 'ExpressionAttributeValues'):
+                if field in request:
+                    request[field] = dict((k, _deserializer.deserialize(v)) for k, v in request[field].items())
+            requests.append((action, request))
+
+        with self._db._lock:
+            reasons = []
+            for action, request in requests:
+                table = self._db._table(request['TableName'])
+                try:
+                    if action == 'Put':
+                        table._check_put(request['Item'], request.get('ConditionExpression'),
+                                         request.get('ExpressionAttributeNames'),
+                                         request.get('ExpressionAttributeValues'), 'TransactWriteItems')
+                    elif action in ('Update', 'ConditionCheck'):
+                        table._check_update(request['Key'], request.get('ConditionExpression'),
+                                            request.get('ExpressionAttributeNames'),
+                                            request.get('ExpressionAttributeValues'), 'TransactWriteItems')
+                    reasons.append({'Code': 'None'})
+                except ClientError:
+                    reasons.append({'Code': 'ConditionalCheckFailed', 'Message': 'The conditional request failed'})
+            if any(reason['Code'] != 'None' for reason in reasons):
+                raise _error('TransactionCanceledException', 'Transaction cancelled', 'TransactWriteItems',
+                             CancellationReasons=reasons)
+
+            for action, request in requests:
+                table = self._db._table(request['TableName'])
+                if action == 'Put':
+                    table._apply_put(request['Item'])
+                elif action == 'Update':
+                    table._apply_update(request['Key'], request['UpdateExpression'],
+                                        request.get('ExpressionAttributeNames'),
+                                        request.get('ExpressionAttributeValues'))
+                elif action == 'Delete':
+                    table.items.pop(table._key_of(_normalize(request['Key'])), None)
+        #a transactional write costs two write units per item
+        return _capacity_by_table([(request['TableName'], 2.0) for action, request in requests
+                                   if action != 'ConditionCheck'], kwargs)
+
+    def batch_write_item(self, RequestItems, **kwargs):
+        self._db._enter('BatchWriteItem', ','.join(sorted(RequestItems)))
+        with self._db._lock:
+            for table_name, writes in RequestItems.items():
+                table = self._db._table(table_name)
+                for write in writes:
+                    if 'PutRequest' in write:
+                        table._apply_put(dict((k, _deserializer.deserialize(v))
+                                              for k, v in write['PutRequest']['Item'].items()))
+                    else:
+                        key = dict((k, _deserializer.deserialize(v)) for k, v in write['DeleteRequest']['Key'].items())
+                        table.items.pop(table._key_of(_normalize(key)), None)
+        response = {'UnprocessedItems': {}}
+        response.update(_capacity_by_table(
+            [(table_name, 1.0) for table_name, writes in RequestItems.items() for write in writes], kwargs))
+        return response
+
+
+class _Meta(object):
+    def __init__(self, client):
+        self.client = client
+
+
+class LocalDynamoDB(object):
+    """A DynamoDB service resource backed by dicts, with optional injected latency and throttling.
+
+    latency_ms is either a number of milliseconds or a callable returning one, applied to every
+    operation. throttle_rate is the probability that an operation fails with
+    ProvisionedThroughputExceededException. Pass seed for a repeatable sequence.
+    """
+    def __init__(self, latency_ms=0, throttle_rate=0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.throttle_rate = throttle_rate
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        self._tables = {}
+        self.calls = Counter()  # (operation, table) -> count
+        self.meta = _Meta(_LocalClient(self))
+
+    def create_table(self, name, hash_key, range_key=None, indexes=None):
+        self._tables[name] = _LocalTable(self, name, hash_key, range_key, indexes)
+        return self._tables[name]
+
+    def Table(self, name):
+        return self._table(name)
+
+    def batch_get_item(self, RequestItems, **kwargs):
+        self._enter('BatchGetItem', ','.join(sorted(RequestItems)))
+        responses = {}
+        with self._lock:
+            for table_name, request in RequestItems.items():
+                table = self._table(table_name)
+                found = [table.items.get(table._key_of(_normalize(key))) for key in request['Keys']]
+                responses[table_name] = [copy.deepcopy(item) for item in found if item is not None]
+        response = {'Responses': responses, 'UnprocessedKeys': {}}
+        #eventually consistent reads: half a unit per item, and at least half a unit per table
+        response.update(_capacity_by_table(
+            [(table_name, max(0.5, 0.5 * len(items))) for table_name, items in responses.items()], kwargs))
+        return response
+
+    def reset_calls(self):
+        self.calls.clear()
+
+    def _table(self, name):
+        if name not in self._tables:
+            raise _error('ResourceNotFoundException', 'Requested resource not found: {}'.format(name), 'DescribeTable')
+        return self._tables[name]
+
+    def _enter(self, operation, table_name):
+        with self._lock:
+            self.calls[(operation, table_name)] += 1
+            latency = self.latency_ms() if callable(self.latency_ms) else self.latency_ms
+            throttled = self.throttle_rate and self._random.random() < self.throttle_rate
+        if latency:
+            time.sleep(latency / 1000.0)
+        if throttled:
+            raise _error('ProvisionedThroughputExceededException', 'Injected throttle', operation)
+
+
+def create_skill_tables(dynamodb):
+    """Create the skill's tables with their production key schemas."""
+    dynamodb.create_table('JPExpUsers', 'UserId', 'PlayerNumber')
+    dynamodb.create_table('JPExpGameStats', 'PlayerNumber', 'CityId')
+    #single-table layout of users and journeys (see backend-code/player_store.py)
+    dynamodb.create_table('JPExpPlayers', 'UserId', 'SK')
+    dynamodb.create_table('JPExpCities', 'CityId', indexes={'CityName-index': ('CityName', None)})
+    dynamodb.create_table('JPExpStories', 'CityId', 'QuestionNumber')
+    dynamodb.create_table('JPExpStoryDetails', 'CityId', 'QuestionNumber')
+    dynamodb.create_table('JPExpFunFacts', 'RecordNumber')
+    return dynamodb
+
+
+def seed_sample_content(dynamodb, cities=('Tokyo', 'Kyoto'), questions_per_city=20, seed=0):
+    """Fill the content tables with synthetic cities, stories and fun facts."""
+    rng = random.Random(seed)
+    for city_id, city_name in enumerate(cities, 1):
+        city_id = str(city_id)
+        dynamodb.Table('JPExpCities').put_item(Item={'CityId': city_id, 'CityName': city_name})
+        for number in range(1, questions_per_city + 1):
+            dynamodb.Table('JPExpStories').put_item(Item={
+                'CityId': city_id, 'QuestionNumber': number,
+                'QuestionText': "{} question {}: will you go?".format(city_name, number)})
+            dynamodb.Table('JPExpStoryDetails').put_item(Item={
+                'CityId': city_id, 'QuestionNumber': number,
+                'YesResponseText': "You went.", 'NoResponseText': "You stayed.",
+                'Tip': "Tip for {} question {}.".format(city_name, number),
+                'YesWealthImpact': rng.randint(-15, 10), 'YesEnergyImpact': rng.randint(-15, 10),
+                'NoWealthImpact': rng.randint(-10, 5), 'NoEnergyImpact': rng.randint(-10, 5)})
+    for number in range(1, 6):
+        dynamodb.Table('JPExpFunFacts').put_item(Item={'RecordNumber': str(number), 'Text': "Fun fact {}".format(number)})
+    return dynamodb
+
+
+#--- expression evaluation ------------------------------------------------------
+
+def _evaluate_key_condition(condition, item):
+    expression = condition.get_expression()
+    operator = expression['operator']
+    values = expression['values']
+    if operator == 'AND':
+        return _evaluate_key_condition(values[0], item) and _evaluate_key_condition(values[1], item)
+    name = values[0].name
+    if name not in item:
+        return False
+    value = item[name]
+    if operator == '=':
+        return value == _normalize(values[1])
+    if operator == '<':
+        return value < _normalize(values[1])
+    if operator == '<=':
+        return value <= _normalize(values[1])
+    if operator == '>':
+        return value > _normalize(values[1])
+    if operator == '>=':
+        return value >= _normalize(values[1])
+    if operator == 'BETWEEN':
+        return _normalize(values[1]) <= value <= _normalize(values[2])
+    if operator == 'begins_with':
+        return str(value).startswith(values[1])
+    raise NotImplementedError("Key condition operator {} is not supported".format(operator))
+
+
+_COMPARISON = re.compile(r'^\s*([#\w.]+)\s*(=|<>|<=|>=|<|>)\s*([:#\w.]+)\s*$')
+_FUNCTION = re.compile(r'^\s*(attribute_exists|attribute_not_exists)\s*\(\s*([#\w.]+)\s*\)\s*$')
+
+
+def _evaluate_condition(condition, item, names, values):
+    if isinstance(condition, ConditionBase):
+        raise NotImplementedError("Use string condition expressions with the local stand-in")
+    names = names or {}
+    values = _normalize(values or {})
+    for clause in re.split(r'\s+AND\s+', condition, flags=re.IGNORECASE):
+        function = _FUNCTION.match(clause)
+        if function:
+            exists = names.get(function.group(2), function.group(2)) in item
+            if exists != (function.group(1) == 'attribute_exists'):
+                return False
+            continue
+        comparison = _COMPARISON.match(clause)
+        if comparison is None:
+            raise NotImplementedError("Condition {!r} is not supported".format(clause))
+        left, operator, right = comparison.groups()
+        left = item.get(names.get(left, left))
+        right = values[right] if right.startswith(':') else item.get(names.get(right, right))
+        if left is None or right is None:
+            if operator != '<>':
+                return False
+            continue
+        if not {
+            '=': left == right, '<>': left != right, '<': left < right,
+            '<=': left <= right, '>': left > right, '>=': left >= right
+        }[operator]:
+            return False
+    return True
+
+
+def _apply_update_expression(item, expression, names, values):
+    #SET a = :x, b = b + :y    REMOVE c, d
+    for action, body in re.findall(r'(?i)\b(set|remove)\b\s+(.*?)(?=\s+\b(?:set|remove)\b\s+|$)', expression.strip()):
+        for clause in [c.strip() for c in body.split(',') if c.strip()]:
+            if action.lower() == 'remove':
+                item.pop(names.get(clause, clause), None)
+                continue
+            target, operand = [part.strip() for part in clause.split('=', 1)]
+            target = names.get(target, target)
+            arithmetic = re.match(r'^([:#\w.]+)\s*([+-])\s*([:#\w.]+)$', operand)
+            if arithmetic:
+                left, sign, right = arithmetic.groups()
+                left = values[left] if left.startswith(':') else item.get(names.get(left, left), 0)
+                right = values[right] if right.startswith(':') else item.get(names.get(right, right), 0)
+                item[target] = left + right if sign == '+' else left - right
+            else:
+                item[target] = values[operand] if operand.startswith(':') else item.get(names.get(operand, operand))
@@ -0,0 +1,199 @@
+"""Copy JPExpUsers and JPExpGameStats into the single-table player layout.
+
+Every user's profile and journeys are written under their UserId in the player table (see
+backend-code/player_store.py), so the skill resolves a returning player with one Query once it
+runs with SINGLE_TABLE=true. Journeys are matched to their user through PlayerNumber; journeys
+whose PlayerNumber matches no user are reported and left behind, and users with several
+JPExpUsers records are reported and merged into one profile. The writes are idempotent puts sent
+as parallel BatchWriteItem calls, so the migration can be re-run until the skill is switched
+over (not after: it would overwrite newer progress with the legacy copy).
+
+    python tools/migrate_single_table.py --dry-run         # plan against the tables in AWS_DEFAULT_REGION
+    python tools/migrate_single_table.py --workers 16 --verify
+    python tools/migrate_single_table.py --self-check --users 5000 --latency-ms 5
+"""
+import argparse
+import concurrent.futures
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+BACKEND_DIR = os.path.join(ROOT, 'backend-code')
+
+os.environ.setdefault('LOG_LEVEL', '40')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+sys.path.insert(0, BACKEND_DIR)
+
+import data_access  # noqa: E402
+import player_store  # noqa: E402
+
+
+class MigrationPlan(object):
+    """The player table items to write, and the legacy data problems found while planning them."""
+    def __init__(self):
+        self.items = []
+        self.users = 0
+        self.journeys = 0
+        self.duplicate_users = []   # UserIds with more than one JPExpUsers record (merged)
+        self.orphan_journeys = []   # JPExpGameStats keys whose PlayerNumber matches no user
+
+    def problems(self):
+        return len(self.duplicate_users) + len(self.orphan_journeys)
+
+
+def plan_migration(users, journeys):
+    # type: (List[Dict[str, Any]], List[Dict[str, Any]]) -> MigrationPlan
+    plan = MigrationPlan()
+
+    records_by_user = {}
+    for user in users:
+        records_by_user.setdefault(user['UserId'], []).append(user)
+    owners = {}
+    for user_id, records in records_by_user.items():
+        profile = records[0]
+        if len(records) > 1:
+            #the skill never resolved these (it needs exactly one record): keep the newest record,
+            #the best MaxTurns, and the journeys of all of them; the pointer is rebuilt by the skill
+            plan.duplicate_users.append(user_id)
+            records.sort(key=lambda record: (record.get('Date', ''), record['PlayerNumber']), reverse=True)
+            profile = dict(records[0])
+            profile['MaxTurns'] = max(record.get('MaxTurns', 0) for record in records)
+            profile.pop('ActiveCityId', None)
+        for record in records:
+            owners[record['PlayerNumber']] = user_id
+        plan.items.append(player_store.profile_item(profile))
+        plan.users += 1
+
+    migrated = {}
+    for journey in journeys:
+        user_id = owners.get(journey['PlayerNumber'])
+        if user_id is None:
+            plan.orphan_journeys.append((journey['PlayerNumber'], journey['CityId']))
+            continue
+        #two records of one user may both have played a city; the active, then the latest, journey wins
+        key = (user_id, journey['CityId'])
+        rank = (journey['ActiveFlag'] == 'Y', journey.get('Date', ''))
+        if key not in migrated or rank > migrated[key][0]:
+            migrated[key] = (rank, player_store.journey_item(user_id, journey))
+    plan.items.extend(item for rank, item in migrated.values())
+    plan.journeys = len(migrated)
+    return plan
+
+
+def write_items(table_name, items, workers):
+    # type: (str, List[Dict[str, Any]], int) -> List[Dict[str, Any]]
+    """Put the items with BatchWriteItem calls spread over a thread pool; returns the ones left unwritten."""
+    batches = [items[i:i + data_access.BATCH_WRITE_LIMIT] for i in range(0, len(items), data_access.BATCH_WRITE_LIMIT)]
+    unwritten = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        for left in executor.map(lambda batch: data_access.batch_put(table_name, batch), batches):
+            unwritten.extend(left)
+    return unwritten
+
+
+def verify(plan, workers):
+    # type: (MigrationPlan, int) -> List[str]
+    """Read every migrated user back the way the skill does and compare with the plan."""
+    expected = {}
+    for item in plan.items:
+        expected.setdefault(item['UserId'], {})[item[player_store.SORT_KEY]] = item
+
+    def check(user_id):
+        stored = data_access.query_all(player_store.PLAYER_TABLE, 'UserId', user_id)
+        player = player_store.Player.from_items(stored)
+        items = expected[user_id]
+        if player.profile != items.get(player_store.PROFILE_SORT_KEY):
+            return "{}: profile does not match".format(user_id)
+        journeys = dict((item['CityId'], item) for sort_key, item in items.items()
+                        if sort_key.startswith(player_store.JOURNEY_PREFIX))
+        if player.journeys != journeys:
+            return "{}: {} journeys stored, {} expected".format(user_id, len(player.journeys), len(journeys))
+        return None
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        return [problem for problem in executor.map(check, sorted(expected)) if problem]
+
+
+def seed_legacy_players(dynamodb, users, seed=0):
+    """Fill JPExpUsers and JPExpGameStats with synthetic players, a few of them broken the usual ways."""
+    rng = random.Random(seed)
+    player_numbers = rng.sample(range(1, 1000000000), users + users // 100 + 1)
+    for n in range(users):
+        user_id = "amzn1.ask.account.LOCAL{:08d}".format(n)
+        player_number = player_numbers[n]
+        cities = rng.sample(['1', '2'], rng.randint(0, 2))
+        active = cities[-1] if cities and rng.random() < 0.7 else None
+        dynamodb.Table('JPExpUsers').put_item(Item={
+            'UserId': user_id, 'PlayerNumber': player_number, 'Name': "TBD-USERAPI", 'Country': "TBD-ADDRESSAPI",
+            'Email': "TBD-CUSTINFOAPI", 'DeviceId': "amzn1.ask.device.LOCAL", 'Date': "2026-01-01",
+            'MaxTurns': rng.randint(0, 20)})
+        for city_id in cities:
+            dynamodb.Table('JPExpGameStats').put_item(Item={
+                'PlayerNumber': player_number, 'CityId': city_id, 'QuestionNumber': rng.randint(1, 20),
+                'CurrentTurns': rng.randint(0, 20), 'MoneyLevel': rng.randint(0, 80), 'EnergyLevel': rng.randint(0, 80),
+                'ActiveFlag': 'Y' if city_id == active else 'N', 'Date': "2026-01-01"})
+    for n in range(users // 100):
+        #a second JPExpUsers record for an existing user, and a journey whose user is gone
+        dynamodb.Table('JPExpUsers').put_item(Item={
+            'UserId': "amzn1.ask.account.LOCAL{:08d}".format(n), 'PlayerNumber': player_numbers[users + n],
+            'Date': "2026-02-01", 'MaxTurns': 0})
+    dynamodb.Table('JPExpGameStats').put_item(Item={
+        'PlayerNumber': player_numbers[-1], 'CityId': '1', 'QuestionNumber': 1, 'CurrentTurns': 0,
+        'MoneyLevel': 50, 'EnergyLevel': 50, 'ActiveFlag': 'Y', 'Date': "2026-01-01"})
+    return dynamodb
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=8, help="concurrent BatchWriteItem calls")
+    parser.add_argument('--dry-run', action='store_true', help="report what would be migrated without writing")
+    parser.add_argument('--verify', action='store_true', help="read every migrated user back afterwards")
+    parser.add_argument('--self-check', action='store_true',
+                        help="migrate synthetic players in the local DynamoDB stand-in and verify them")
+    parser.add_argument('--users', type=int, default=1000, help="synthetic players for --self-check")
+    parser.add_argument('--latency-ms', type=float, default=0, help="injected latency for --self-check")
+    args = parser.parse_args()
+
+    if args.self_check:
+        from local_dynamodb import LocalDynamoDB, create_skill_tables
+        dynamodb = create_skill_tables(LocalDynamoDB())
+        seed_legacy_players(dynamodb, args.users)
+        dynamodb.latency_ms = args.latency_ms
+        data_access.set_resource(dynamodb)
+        args.verify = True
+
+    started = time.time()
+    plan = plan_migration(data_access.scan_all(player_store.USERS_TABLE), data_access.scan_all(player_store.JOURNEYS_TABLE))
+    print("{} users, {} journeys -> {} items in {}".format(
+        plan.users, plan.journeys, len(plan.items), player_store.PLAYER_TABLE))
+    for user_id in plan.duplicate_users:
+        print("warning: {} has several {} records; merged into one profile".format(user_id, player_store.USERS_TABLE))
+    for player_number, city_id in plan.orphan_journeys:
+        print("warning: journey {}/{} has no user; not migrated".format(player_number, city_id))
+    if args.dry_run:
+        return 0
+
+    unwritten = write_items(player_store.PLAYER_TABLE, plan.items, args.workers)
+    print("wrote {} items with {} workers in {:.2f}s".format(
+        len(plan.items) - len(unwritten), args.workers, time.time() - started))
+    if unwritten:
+        print("error: {} items were throttled and not written; run the migration again".format(len(unwritten)))
+        return 1
+
+    if args.verify:
+        problems = verify(plan, args.workers)
+        for problem in problems:
+            print("error: " + problem)
+        print("verified {} users: {} problems".format(plan.users, len(problems)))
+        if problems:
+            return 1
+    if args.self_check and plan.problems() != args.users // 100 + 1:
+        print("error: expected {} legacy problems to be reported, got {}".format(args.users // 100 + 1, plan.problems()))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Micro-benchmark of response construction and serialization per intent.
+
+For each static intent it times building the response the way the handlers used to (a fresh
+ResponseFactory with speak/ask) and serializing its envelope with the ASK DefaultSerializer,
+against copying the prebuilt template and serializing with the skill's FrozenSerializer. The
+"APL turn" row serializes a gameplay response carrying the RenderDocumentDirective, whose
+document is the bulk of the payload.
+
+    python tools/response_benchmark.py --iterations 2000
+"""
+import argparse
+import os
+import sys
+import timeit
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+BACKEND_DIR = os.path.join(ROOT, 'backend-code')
+
+os.environ.setdefault('LOG_LEVEL', '40')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+sys.path.insert(0, BACKEND_DIR)
+
+from session_state import JourneyState, UserState  # noqa: E402
+
+FACT = "Nagasaki is known for its delicious Japanese sake."
+
+
+def warm_session_attributes():
+    #the attributes of a mid-journey turn, built with session_state so they follow its current layout
+    journey = JourneyState(1, '1', 3, 3, 40, 45, 'Y')
+    journey.mark_saved()
+    return {'city': 'Tokyo',
+            'user': UserState('amzn1.ask.account.testUser', 1, 3, '1').to_session(),
+            'stats_record': journey.to_session()}
+
+
+SESSION_ATTRIBUTES = warm_session_attributes()
+
+
+def envelope(response):
+    from ask_sdk_model import ResponseEnvelope
+    return ResponseEnvelope(response=response, version="1.0", session_attributes=SESSION_ATTRIBUTES)
+
+
+def built(speech, reprompt=None, directive=None):
+    from ask_sdk_core.response_helper import ResponseFactory
+    factory = ResponseFactory().speak(speech)
+    if reprompt is not None:
+        factory.ask(reprompt)
+    if directive is not None:
+        factory.add_directive(directive)
+    return factory.response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    from ask_sdk_core.serialize import DefaultSerializer
+    from ask_sdk_model.interfaces.alexa.presentation.apl import RenderDocumentDirective
+    import lambda_function as lf
+
+    default = DefaultSerializer()
+    frozen = lf.serializer
+    goodbye = "Goodbye!{}. New journeys to Sapporo, Nagasaki, and Okinawa coming soon!"
+    turn_speech = "Be careful explorer, you are running low on wealth or energy. Tokyo question 4: will you go?"
+
+    def apl_directive():
+        return RenderDocumentDirective(document=lf.APL_DOCUMENT, datasources=lf.APL_DATASOURCES)
+
+    cases = [
+        ('AMAZON.HelpIntent',
+         lambda: default.serialize(envelope(built(lf.HELP_MESSAGE, lf.HELP_MESSAGE))),
+         lambda: frozen.serialize(envelope(lf.HELP_RESPONSE.response()))),
+        ('AMAZON.FallbackIntent',
+         lambda: default.serialize(envelope(built(lf.FALLBACK_MESSAGE, lf.FALLBACK_REPROMPT))),
+         lambda: frozen.serialize(envelope(lf.FALLBACK_RESPONSE.response()))),
+        ('AMAZON.CancelIntent',
+         lambda: default.serialize(envelope(built(goodbye.format(FACT)))),
+         lambda: frozen.serialize(envelope(lf.GOODBYE_RESPONSE.response(FACT)))),
+        ('APL turn',
+         lambda: default.serialize(envelope(built(turn_speech, turn_speech, apl_directive()))),
+         lambda: frozen.serialize(envelope(built(turn_speech, turn_speech, apl_directive())))),
+    ]
+
+    print("{:<24} {:>12} {:>12} {:>8}".format('intent', 'before us', 'after us', 'speedup'))
+    for name, before, after in cases:
+        assert before() == after(), name
+        timings = [timeit.timeit(fn, number=args.iterations) / args.iterations * 1e6 for fn in (before, after)]
+        print("{:<24} {:>12.1f} {:>12.1f} {:>7.1f}x".format(name, timings[0], timings[1], timings[0] / timings[1]))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
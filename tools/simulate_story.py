@@ -0,0 +1,182 @@
+"""Monte Carlo balance check of a city's story under the game engine's rules.
+
+Plays many yes/no paths through a story at once, as NumPy arrays with one row per player, and
+reports how many turns journeys last, how they end, and at which questions players run out of
+wealth or energy. Stories come from the content bundle or DynamoDB, like the skill reads them,
+or from the local stand-in's synthetic content with --sample.
+
+    python tools/simulate_story.py --city Tokyo --paths 2000000 --policy random --yes-share 0.5
+    python tools/simulate_story.py --sample --city Kyoto --policy greedy --verify 200
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+BACKEND_DIR = os.path.join(ROOT, 'backend-code')
+
+os.environ.setdefault('LOG_LEVEL', '40')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+sys.path.insert(0, BACKEND_DIR)
+
+import game_engine  # noqa: E402
+
+POLICIES = ('random', 'yes', 'no', 'greedy')
+
+
+class StoryArrays(object):
+    """A story's per-question impacts as arrays: deltas[question, answer] = (wealth, energy)."""
+    def __init__(self, city_name, question_numbers, deltas):
+        self.city_name = city_name
+        self.question_numbers = question_numbers
+        self.deltas = deltas  # shape (questions, 2 answers: yes/no, 2 stats: wealth/energy)
+
+    @classmethod
+    def from_story(cls, city_name, story):
+        #a journey plays details 1, 2, ... and ends at the first number the story doesn't have
+        numbers = []
+        while story.get_detail(len(numbers) + 1) is not None:
+            numbers.append(len(numbers) + 1)
+        deltas = np.zeros((len(numbers), 2, 2), dtype=np.int32)
+        for i, number in enumerate(numbers):
+            detail = story.get_detail(number)
+            deltas[i, 0] = game_engine.impact(detail, game_engine.YES)
+            deltas[i, 1] = game_engine.impact(detail, game_engine.NO)
+        return cls(city_name, numbers, deltas)
+
+
+def choose(policy, rng, question, money, energy, deltas, yes_share):
+    """Return a bool array, True where the player answers yes to this question."""
+    if policy == 'yes':
+        return np.ones(money.shape, dtype=bool)
+    if policy == 'no':
+        return np.zeros(money.shape, dtype=bool)
+    if policy == 'greedy':
+        #pick the answer that leaves the weaker of the two levels higher
+        yes_floor = np.minimum(money + deltas[question, 0, 0], energy + deltas[question, 0, 1])
+        no_floor = np.minimum(money + deltas[question, 1, 0], energy + deltas[question, 1, 1])
+        return yes_floor >= no_floor
+    return rng.random(money.shape, dtype=np.float32) < yes_share
+
+
+def simulate_batch(story, paths, policy, rng, yes_share, record_answers=0):
+    """Play `paths` journeys; return turns played, whether each ran out of levels, and the recorded answers."""
+    questions = len(story.question_numbers)
+    money = np.full(paths, game_engine.STARTING_MONEY, dtype=np.int32)
+    energy = np.full(paths, game_engine.STARTING_ENERGY, dtype=np.int32)
+    alive = np.ones(paths, dtype=bool)
+    turns = np.zeros(paths, dtype=np.int32)
+    answers = np.zeros((min(record_answers, paths), questions), dtype=bool)
+
+    for question in range(questions):
+        yes = choose(policy, rng, question, money, energy, story.deltas, yes_share)
+        if record_answers:
+            answers[:, question] = yes[:len(answers)]
+        wealth = np.where(yes, story.deltas[question, 0, 0], story.deltas[question, 1, 0])
+        vigour = np.where(yes, story.deltas[question, 0, 1], story.deltas[question, 1, 1])
+        #levels keep moving after a journey ends, but only `alive` and `turns` are read for those rows
+        money += wealth
+        energy += vigour
+        turns += alive
+        alive &= ~((money <= 0) | (energy <= 0))
+        if not alive.any():
+            break
+    return turns, ~alive, answers
+
+
+def replay(story, answers):
+    """Play recorded answers through game_engine itself; returns (turns, ran_out) per path."""
+    results = []
+    for path in answers:
+        levels = game_engine.starting_levels()
+        ran_out = False
+        for question, yes in enumerate(path):
+            detail = {'YesWealthImpact': story.deltas[question, 0, 0], 'YesEnergyImpact': story.deltas[question, 0, 1],
+                      'NoWealthImpact': story.deltas[question, 1, 0], 'NoEnergyImpact': story.deltas[question, 1, 1]}
+            turn = game_engine.play_turn(levels, detail, game_engine.YES if yes else game_engine.NO)
+            levels = turn.levels
+            if turn.outcome == game_engine.GAME_OVER:
+                ran_out = True
+                break
+        results.append((levels.current_turns, ran_out))
+    return results
+
+
+def report(story, turns, ran_out, seconds):
+    questions = len(story.question_numbers)
+    paths = len(turns)
+    print("{}: {} questions, {} paths in {:.2f}s ({:.1f}M paths/s)".format(
+        story.city_name, questions, paths, seconds, paths / seconds / 1e6))
+    print("ran out of wealth or energy: {:.2%}   finished the story: {:.2%}".format(
+        ran_out.mean(), 1 - ran_out.mean()))
+    print("turns: mean {:.2f}  p10 {:.0f}  p50 {:.0f}  p90 {:.0f}  p99 {:.0f}".format(
+        turns.mean(), *np.percentile(turns, [10, 50, 90, 99])))
+
+    #where the journeys that ran out ended, per question
+    endings = np.bincount(turns[ran_out], minlength=questions + 1)[1:]
+    reached = paths - np.concatenate(([0], np.cumsum(endings)[:-1]))
+    print("\n{:>9} {:>9} {:>12}".format('question', 'ended', 'of reached'))
+    for i, number in enumerate(story.question_numbers):
+        if endings[i]:
+            print("{:>9} {:>8.2%} {:>11.2%}".format(number, endings[i] / paths, endings[i] / max(reached[i], 1)))
+
+
+def load_story(args):
+    import data_access
+    from city_registry import city_registry
+    from story_cache import load_city_story
+
+    if args.sample:
+        import content_bundle
+        from local_dynamodb import LocalDynamoDB, create_skill_tables, seed_sample_content
+        content_bundle.set_bundle(None)
+        data_access.set_resource(seed_sample_content(
+            create_skill_tables(LocalDynamoDB()), questions_per_city=args.questions, seed=args.seed))
+    city = city_registry.by_name(args.city)
+    if city is None:
+        raise SystemExit("Unknown city {}".format(args.city))
+    return StoryArrays.from_story(city.name, load_city_story(city.city_id))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--city', default='Tokyo')
+    parser.add_argument('--paths', type=int, default=1000000)
+    parser.add_argument('--batch', type=int, default=1000000, help="paths simulated per array pass")
+    parser.add_argument('--policy', choices=POLICIES, default='random')
+    parser.add_argument('--yes-share', type=float, default=0.5, help="chance of yes under the random policy")
+    parser.add_argument('--verify', type=int, default=0, help="replay this many paths through game_engine")
+    parser.add_argument('--sample', action='store_true', help="use the local stand-in's synthetic stories")
+    parser.add_argument('--questions', type=int, default=30, help="questions per synthetic story with --sample")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    story = load_story(args)
+    if not story.question_numbers:
+        raise SystemExit("{} has no playable questions".format(story.city_name))
+    rng = np.random.default_rng(args.seed)
+
+    start = time.perf_counter()
+    turns, ran_out = [], []
+    remaining = args.paths
+    while remaining:
+        batch = min(args.batch, remaining)
+        batch_turns, batch_ran_out, answers = simulate_batch(
+            story, batch, args.policy, rng, args.yes_share, record_answers=args.verify if not turns else 0)
+        if args.verify and not turns:
+            expected = list(zip(batch_turns[:len(answers)].tolist(), batch_ran_out[:len(answers)].tolist()))
+            if replay(story, answers) != expected:
+                raise SystemExit("the vectorized rules disagree with game_engine")
+            print("verified {} paths against game_engine".format(len(answers)))
+        turns.append(batch_turns)
+        ran_out.append(batch_ran_out)
+        remaining -= batch
+    report(story, np.concatenate(turns), np.concatenate(ran_out), time.perf_counter() - start)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())